@@ -0,0 +1,278 @@
+"""Sales aggregates per movie, per show and per day.
+
+The aggregate tables are updated inside the same transaction as the booking
+or cancellation that changes them, so reads never have to scan bookings.
+``rebuild`` recomputes everything from the bookings table.
+
+Occupancy is seats sold over the capacity of the shows that sold anything,
+so every aggregate also carries the summed capacity of those shows.
+"""
+
+SEAT_COUNT_SQL = "LENGTH(seats) - LENGTH(REPLACE(seats, ',', '')) + 1"
+
+
+def create_tables(c):
+    c.execute(
+        """
+        CREATE TABLE show_stats (
+            movie_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            bookings INTEGER NOT NULL DEFAULT 0,
+            seats_sold INTEGER NOT NULL DEFAULT 0,
+            revenue INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (movie_id, date, time)
+        )
+    """
+    )
+    c.execute("CREATE INDEX idx_show_stats_date ON show_stats(date)")
+    c.execute(
+        """
+        CREATE TABLE movie_stats (
+            movie_id INTEGER PRIMARY KEY,
+            movie_title TEXT,
+            shows INTEGER NOT NULL DEFAULT 0,
+            bookings INTEGER NOT NULL DEFAULT 0,
+            seats_sold INTEGER NOT NULL DEFAULT 0,
+            revenue INTEGER NOT NULL DEFAULT 0
+        )
+    """
+    )
+    c.execute(
+        """
+        CREATE TABLE daily_stats (
+            date TEXT PRIMARY KEY,
+            shows INTEGER NOT NULL DEFAULT 0,
+            bookings INTEGER NOT NULL DEFAULT 0,
+            seats_sold INTEGER NOT NULL DEFAULT 0,
+            revenue INTEGER NOT NULL DEFAULT 0
+        )
+    """
+    )
+
+
+# Per-show capacities, added once shows knew their screen
+def add_capacity(c):
+    for table in ("show_stats", "movie_stats", "daily_stats"):
+        c.execute(f"ALTER TABLE {table} ADD COLUMN capacity INTEGER NOT NULL DEFAULT 0")
+
+
+# Apply a change to every aggregate; negative deltas undo a booking
+def _apply(c, key, movie_title, bookings, seats, revenue):
+    movie_id, date, time = key
+    c.execute(
+        "SELECT bookings FROM show_stats WHERE movie_id=? AND date=? AND time=?",
+        key,
+    )
+    row = c.fetchone()
+    before = row[0] if row else 0
+    after = before + bookings
+    # A show counts towards occupancy while it has at least one booking
+    shows = (after > 0) - (before > 0)
+    capacity = 0
+    if shows:
+        c.execute(
+            "SELECT capacity FROM shows WHERE movie_id=? AND date=? AND time=?", key
+        )
+        row = c.fetchone()
+        capacity = shows * (row[0] if row else 0)
+
+    if after > 0:
+        c.execute(
+            """
+            INSERT INTO show_stats (movie_id, date, time, bookings, seats_sold, revenue, capacity)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (movie_id, date, time) DO UPDATE SET
+                bookings = bookings + excluded.bookings,
+                seats_sold = seats_sold + excluded.seats_sold,
+                revenue = revenue + excluded.revenue
+        """,
+            (movie_id, date, time, bookings, seats, revenue, capacity),
+        )
+    else:
+        c.execute(
+            "DELETE FROM show_stats WHERE movie_id=? AND date=? AND time=?", key
+        )
+
+    c.execute(
+        """
+        INSERT INTO movie_stats (movie_id, movie_title, shows, bookings, seats_sold, revenue, capacity)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (movie_id) DO UPDATE SET
+            movie_title = COALESCE(excluded.movie_title, movie_title),
+            shows = shows + excluded.shows,
+            bookings = bookings + excluded.bookings,
+            seats_sold = seats_sold + excluded.seats_sold,
+            revenue = revenue + excluded.revenue,
+            capacity = capacity + excluded.capacity
+    """,
+        (movie_id, movie_title, shows, bookings, seats, revenue, capacity),
+    )
+    c.execute(
+        """
+        INSERT INTO daily_stats (date, shows, bookings, seats_sold, revenue, capacity)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (date) DO UPDATE SET
+            shows = shows + excluded.shows,
+            bookings = bookings + excluded.bookings,
+            seats_sold = seats_sold + excluded.seats_sold,
+            revenue = revenue + excluded.revenue,
+            capacity = capacity + excluded.capacity
+    """,
+        (date, shows, bookings, seats, revenue, capacity),
+    )
+    c.execute("DELETE FROM movie_stats WHERE movie_id=? AND bookings <= 0", (movie_id,))
+    c.execute("DELETE FROM daily_stats WHERE date=? AND bookings <= 0", (date,))
+
+
+def record_booking(c, key, movie_title, seats, total):
+    _apply(c, key, movie_title, 1, seats, total)
+
+
+# Several bookings for one show at once, e.g. from a batch
+def record_bookings(c, key, movie_title, bookings, seats, total):
+    _apply(c, key, movie_title, bookings, seats, total)
+
+
+def record_cancellation(c, key, movie_title, seats, total):
+    _apply(c, key, movie_title, -1, -seats, -total)
+
+
+# Recompute all aggregates from the non-cancelled bookings
+def rebuild(c):
+    c.execute("DELETE FROM show_stats")
+    c.execute("DELETE FROM movie_stats")
+    c.execute("DELETE FROM daily_stats")
+    c.execute(
+        f"""
+        INSERT INTO show_stats (movie_id, date, time, bookings, seats_sold, revenue, capacity)
+        SELECT b.movie_id, b.date, b.time, COUNT(*), SUM({SEAT_COUNT_SQL}), SUM(b.total),
+               COALESCE(MAX(s.capacity), 0)
+        FROM bookings b
+        LEFT JOIN shows s ON s.movie_id = b.movie_id AND s.date = b.date AND s.time = b.time
+        WHERE b.status != 'Cancelled' AND b.movie_id IS NOT NULL
+        AND b.date IS NOT NULL AND b.time IS NOT NULL
+        AND b.seats IS NOT NULL AND b.seats != ''
+        GROUP BY b.movie_id, b.date, b.time
+    """
+    )
+    c.execute(
+        """
+        INSERT INTO movie_stats (movie_id, movie_title, shows, bookings, seats_sold, revenue, capacity)
+        SELECT s.movie_id, m.title, COUNT(*), SUM(s.bookings), SUM(s.seats_sold),
+               SUM(s.revenue), SUM(s.capacity)
+        FROM show_stats s LEFT JOIN movies m ON m.id = s.movie_id
+        GROUP BY s.movie_id
+    """
+    )
+    c.execute(
+        """
+        INSERT INTO daily_stats (date, shows, bookings, seats_sold, revenue, capacity)
+        SELECT date, COUNT(*), SUM(bookings), SUM(seats_sold), SUM(revenue), SUM(capacity)
+        FROM show_stats GROUP BY date
+    """
+    )
+
+
+def snapshot(c):
+    return {
+        table: sorted(c.execute(f"SELECT * FROM {table}").fetchall())
+        for table in ("show_stats", "movie_stats", "daily_stats")
+    }
+
+
+def _occupancy(seats_sold, capacity):
+    return round(seats_sold / capacity, 4) if capacity else 0.0
+
+
+def _rollup(row):
+    shows, bookings, seats_sold, revenue, capacity = row
+    return {
+        "shows": shows,
+        "bookings": bookings,
+        "seats_sold": seats_sold,
+        "revenue": revenue,
+        "capacity": capacity,
+        "occupancy_rate": _occupancy(seats_sold, capacity),
+    }
+
+
+def _date_range(column, date_from, date_to):
+    clauses, params = [], []
+    if date_from:
+        clauses.append(f"{column} >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append(f"{column} <= ?")
+        params.append(date_to)
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+
+# Per-movie, per-day and per-show rollups, optionally for a date range
+def summary(c, date_from=None, date_to=None, include_shows=False):
+    where, params = _date_range("date", date_from, date_to)
+
+    c.execute(
+        f"""
+        SELECT date, shows, bookings, seats_sold, revenue, capacity
+        FROM daily_stats {where} ORDER BY date
+    """,
+        params,
+    )
+    per_day = [{"date": row[0], **_rollup(row[1:])} for row in c.fetchall()]
+
+    # Whole-history totals per movie are already aggregated; a date range
+    # has to be summed from the per-show rows inside it
+    if params:
+        show_where, _ = _date_range("s.date", date_from, date_to)
+        c.execute(
+            f"""
+            SELECT s.movie_id, m.title, COUNT(*), SUM(s.bookings),
+                   SUM(s.seats_sold), SUM(s.revenue), SUM(s.capacity)
+            FROM show_stats s LEFT JOIN movies m ON m.id = s.movie_id
+            {show_where}
+            GROUP BY s.movie_id ORDER BY s.movie_id
+        """,
+            params,
+        )
+    else:
+        c.execute(
+            """
+            SELECT movie_id, movie_title, shows, bookings, seats_sold, revenue, capacity
+            FROM movie_stats ORDER BY movie_id
+        """
+        )
+    per_movie = [
+        {"movie_id": row[0], "movie_title": row[1], **_rollup(row[2:])}
+        for row in c.fetchall()
+    ]
+
+    totals = _rollup(
+        (
+            sum(d["shows"] for d in per_day),
+            sum(d["bookings"] for d in per_day),
+            sum(d["seats_sold"] for d in per_day),
+            sum(d["revenue"] for d in per_day),
+            sum(d["capacity"] for d in per_day),
+        )
+    )
+    result = {"totals": totals, "per_movie": per_movie, "per_day": per_day}
+
+    if include_shows:
+        c.execute(
+            f"""
+            SELECT movie_id, date, time, bookings, seats_sold, revenue, capacity
+            FROM show_stats {where} ORDER BY date, movie_id, time
+        """,
+            params,
+        )
+        result["per_show"] = [
+            {
+                "movie_id": row[0],
+                "date": row[1],
+                "time": row[2],
+                **_rollup((1,) + row[3:]),
+            }
+            for row in c.fetchall()
+        ]
+    return result
@@ -1,10 +1,117 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, Blueprint, render_template, request, jsonify, session, redirect, url_for
+from flask import Response, current_app, stream_with_context
+from werkzeug.local import LocalProxy
+import click
+import json
+import os
+import secrets
 import sqlite3
-import heapq
-
-app = Flask(__name__)
-app.secret_key = "cinebook_secret"
-DB_FILE = "movies.db"
+import db
+import events
+import ingest
+import metrics
+import shared
+from db import get_db, get_pool, transaction
+from seat_index import SeatIndex
+import reservations
+import analytics
+from catalog import MovieCatalog, parse_duration, parse_price, parse_sort, validate_movies, insert_movies
+import layouts
+from layouts import DEFAULT_SCREEN_ID, LayoutStore
+import schedule
+from migrations import LATEST_VERSION, ensure_schema, migrate
+from reservations import SeatConflict, HoldNotFound, HoldSweeper, BatchConflict
+
+DB_FILE = os.environ.get("CINEBOOK_DB", "movies.db")
+MAX_AUTO_ASSIGN_RETRIES = 3
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 500
+SEED_SCHEDULE_DAYS = 7
+MAX_BATCH_BOOKINGS = 1000
+MAX_REPORTED_FAILURES = 100
+
+# Seat index ops and the live event each one is streamed as
+SEAT_EVENTS = {
+    "book": "booked",
+    "confirm": "booked",
+    "hold": "held",
+    "unhold": "released",
+    "release": "released",
+}
+
+bp = Blueprint("cinebook", __name__, cli_group=None)
+
+
+# In-process caches and background threads of one app. Every worker process
+# has its own and keeps it in step with the others through shared.MessageBus.
+# Seat changes reach the caches only through the message log, this worker's
+# own included, so every worker applies them in commit order.
+class AppState:
+    def __init__(self, pool):
+        self.pool = pool
+        self.seat_index = SeatIndex()
+        self.catalog = MovieCatalog()
+        self.layout_store = LayoutStore()
+        self.broker = events.EventBroker()
+        self.bus = shared.MessageBus(pool, self.on_message, self.drop_caches)
+        self.hold_sweeper = HoldSweeper(pool, self.seats_changed)
+        # Migrations bootstrap_db applied when this app was created
+        self.migrations_applied = []
+
+    # Apply a seat change from the log to this worker's index and live streams
+    def apply_seats(self, op, key, seats):
+        if self.seat_index.loaded:
+            getattr(self.seat_index, op)(key, seats)
+        self.broker.publish(key, SEAT_EVENTS[op], seats)
+
+    # on_change hook for reservations: log a seat change inside the
+    # transaction (c) that makes it
+    def seats_changed(self, c, op, key, seats):
+        self.bus.publish(c, "seats", {"op": op, "key": list(key), "seats": list(seats)})
+
+    def catalog_changed(self, conn):
+        self.catalog.invalidate()
+        self.bus.publish(conn, "catalog")
+
+    def on_message(self, topic, data):
+        if topic == "seats":
+            self.apply_seats(data["op"], SeatIndex.show_key(*data["key"]), data["seats"])
+        elif topic == "catalog":
+            self.catalog.invalidate()
+
+    def drop_caches(self):
+        self.seat_index.reset()
+        self.catalog.invalidate()
+        self.layout_store.clear()
+
+    def start(self):
+        self.hold_sweeper.start()
+        self.bus.start()
+
+    def stop(self):
+        self.hold_sweeper.stop()
+        self.bus.stop()
+
+
+def get_state():
+    return current_app.extensions["cinebook"]
+
+
+seat_index = LocalProxy(lambda: get_state().seat_index)
+catalog = LocalProxy(lambda: get_state().catalog)
+layout_store = LocalProxy(lambda: get_state().layout_store)
+broker = LocalProxy(lambda: get_state().broker)
+
+
+# on_change hook for reservations calls made by a request
+def seats_changed(c, op, key, seats):
+    get_state().seats_changed(c, op, key, seats)
+
+
+# Apply changes logged since the last sync, including this request's own
+def sync_state():
+    get_state().bus.sync(get_db())
 
 
 # ------------------ DSA Functions ------------------
@@ -24,93 +131,72 @@ def binary_search_movie(movies, movie_id):
     return None
 
 
-# Quick Sort for movies
-def quick_sort_movies(arr, key):
-    if len(arr) <= 1:
-        return arr
-    pivot = arr[len(arr) // 2]
-    left = [x for x in arr if x[key] < pivot[key]]
-    middle = [x for x in arr if x[key] == pivot[key]]
-    right = [x for x in arr if x[key] > pivot[key]]
-    return quick_sort_movies(left, key) + middle + quick_sort_movies(right, key)
+# Build the seat bitmap index on first use
+def get_seat_index():
+    if not seat_index.loaded:
+        seat_index.load(get_db())
+    return seat_index
+
+
+# Seat layout of the screen a show is assigned to
+def get_show_layout(key):
+    c = get_db().cursor()
+    screen_id = schedule.screen_for_show(c, key) or DEFAULT_SCREEN_ID
+    return layout_store.get(c, screen_id)
+
+
+# Error response for a show that cannot be sold, or None
+def show_error(show):
+    if not show:
+        return jsonify({"message": "Show not found"}), 404
+    if schedule.has_started(show):
+        return jsonify({"message": "Show has already started"}), 400
+    return None
 
 
-# Heap-based seat optimization
+# Best-seat allocation: the most central free block of num_seats seats
 def heap_optimize_seats(movie_id, date, time, num_seats):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(
-        "SELECT seats FROM bookings WHERE movie_id=? AND date=? AND time=?",
-        (movie_id, date, time),
-    )
-    booked = []
-    for row in c.fetchall():
-        booked += list(map(int, row[0].split(",")))
-    conn.close()
+    key = SeatIndex.show_key(movie_id, date, time)
+    layout = get_show_layout(key)
+    return layout.allocate(get_seat_index().occupied(key), num_seats)
+
+
+# JSON integers only: true, 2.7 and "3" are rejected rather than coerced
+def is_integer(value):
+    return type(value) is int
 
-    total_seats = 50
-    available = [i for i in range(1, total_seats + 1) if i not in booked]
 
-    # Min-heap based on distance from center
-    mid = total_seats // 2
-    heap = [(abs(seat - mid), seat) for seat in available]
-    heapq.heapify(heap)
+# Validate requested seat numbers; returns an error message or None
+def validate_seats(seats, layout):
+    if not isinstance(seats, list) or not all(layout.is_sellable(s) for s in seats):
+        return f"Seats must be sellable seats between 1 and {layout.capacity}"
+    if len(set(seats)) != len(seats):
+        return "Duplicate seats requested"
+    return None
+
 
-    assigned = []
-    while len(assigned) < num_seats and heap:
-        assigned.append(heapq.heappop(heap)[1])
-    return sorted(assigned)
+# Response fields for per-item failures of a bulk request; long lists are cut
+def failure_report(failures):
+    return {"failed": len(failures), "failures": failures[:MAX_REPORTED_FAILURES]}
 
 
 # ------------------ Database Initialization ------------------
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+# Bring the schema up to date, checking once per process, and seed a
+# database that was created just now. Read-only workers only check the
+# version. Returns the migrations applied.
+def bootstrap_db(pool, read_only=False):
+    applied = ensure_schema(pool, read_only)
+    if applied[:1] == [1]:
+        seed(pool)
+    return applied
 
-    # Create movies table
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS movies (
-            id INTEGER PRIMARY KEY,
-            title TEXT NOT NULL,
-            genre TEXT,
-            duration TEXT,
-            price INTEGER
-        )
-    """
-    )
 
-    # Create bookings table
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS bookings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            movie_id INTEGER,
-            movie_title TEXT,
-            date TEXT,
-            time TEXT,
-            seats TEXT,
-            name TEXT,
-            email TEXT,
-            phone TEXT,
-            total INTEGER,
-            status TEXT
-        )
-    """
-    )
+def seed(pool):
+    with pool.connection() as conn, transaction(conn) as c:
+        seed_db(c)
 
-    # Create users table
-    c.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password TEXT,
-            role TEXT CHECK(role IN ('admin','user'))
-        )
-    """
-    )
 
+def seed_db(c):
     # Add default admin account if none exists
     c.execute("SELECT COUNT(*) FROM users WHERE role='admin'")
     if c.fetchone()[0] == 0:
@@ -130,32 +216,38 @@ def init_db():
             (6, "Pulp Fiction", "Crime", "154 min", 200),
         ]
         c.executemany(
-            "INSERT INTO movies (id, title, genre, duration, price) VALUES (?, ?, ?, ?, ?)",
-            movies,
+            "INSERT INTO movies (id, title, genre, duration, price, duration_minutes) VALUES (?, ?, ?, ?, ?, ?)",
+            [movie + (parse_duration(movie[3]),) for movie in movies],
         )
-    conn.commit()
-    conn.close()
-
 
-init_db()
+    # Give every movie the default showtimes for the coming week whenever
+    # nothing is scheduled ahead
+    c.execute("SELECT 1 FROM shows WHERE starts_at > ? LIMIT 1", (schedule.now_text(),))
+    if not c.fetchone():
+        c.execute("SELECT id FROM movies")
+        movie_ids = [row[0] for row in c.fetchall()]
+        dates = schedule.upcoming_dates(SEED_SCHEDULE_DAYS)
+        items = schedule.generate_schedule(movie_ids, DEFAULT_SCREEN_ID, dates)
+        rows, _errors = schedule.validate_schedule(
+            items, set(movie_ids), LayoutStore().capacities(c)
+        )
+        schedule.insert_shows(c, rows)
 
 
 # ------------------ Authentication Routes ------------------
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
         data = request.json
         username = data.get("username")
         password = data.get("password")
 
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
+        c = get_db().cursor()
         c.execute(
             "SELECT id, role FROM users WHERE username=? AND password=?",
             (username, password),
         )
         row = c.fetchone()
-        conn.close()
 
         if row:
             session["user"] = username
@@ -170,7 +262,7 @@ def login():
     return render_template("login.html")
 
 
-@app.route("/register", methods=["POST"])
+@bp.route("/register", methods=["POST"])
 def register():
     data = request.json
     username = data.get("username")
@@ -179,24 +271,20 @@ def register():
     if not username or not password:
         return jsonify({"error": "Username and password required"}), 400
 
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = get_db().cursor()
 
     try:
         c.execute(
             "INSERT INTO users (username,password,role)VALUES(?,?,?)",
             (username, password, "user"),
         )
-        conn.commit()
     except sqlite3.IntegrityError:
         return jsonify({"error": "Username already exists"}), 400
-    finally:
-        conn.close()
 
     return jsonify({"message": "Registration successful! Please login."})
 
 
-@app.route("/logout")
+@bp.route("/logout")
 def logout():
     session.clear()
     return redirect("/login")
@@ -205,55 +293,59 @@ def logout():
 # ------------------ Routes ------------------
 
 
-@app.route("/")
+@bp.route("/")
 def index():
     if "role" not in session or session["role"] != "user":
         return redirect("/login")
-    return render_template("index.html")
+    return render_template("index.html", user=session["user"], user_id=session["id"])
 
 
-@app.route("/admin")
+@bp.route("/admin")
 def admin_dashboard():
     if "role" not in session or session["role"] != "admin":
         return redirect("/login")
     return render_template("admin.html")
 
 
-@app.route("/api/movies")
+# Served from the catalog cache; clients that send back the ETag get a 304.
+# ?genre= filters, ?sort_by=price,-title sorts (or sort_by=price&order=desc),
+# ?q= searches titles, ?limit=&offset= pages.
+@bp.route("/api/movies")
 def get_movies():
     genre = request.args.get("genre", "").lower()
-    sort_by = request.args.get("sort_by", "")
-
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT * FROM movies")
-    movies = [
-        {
-            "id": row[0],
-            "title": row[1],
-            "genre": row[2],
-            "duration": row[3],
-            "price": row[4],
-        }
-        for row in c.fetchall()
-    ]
-    conn.close()
-
-    # Filter by genre
-    if genre:
-        movies = [m for m in movies if m["genre"].lower() == genre]
+    sort = parse_sort(request.args.get("sort_by", ""), request.args.get("order", ""))
+    q = request.args.get("q", "").strip().lower()
+    limit = request.args.get("limit", type=int)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    if limit is not None:
+        limit = max(limit, 0)
+
+    conn = get_db()
+    etag = catalog.etag(conn, genre, sort, q, limit, offset)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(
+            catalog.payload(conn, genre, sort, q, limit, offset),
+            mimetype="application/json",
+        )
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
-    # Sort using Quick Sort
-    if sort_by in ["price", "title", "duration"]:
-        movies = quick_sort_movies(movies, sort_by)
 
-    return jsonify(movies)
+# Fetch a movie by id, or None
+def find_movie(movie_id):
+    return catalog.get(get_db(), movie_id)
 
 
-@app.route("/api/book", methods=["POST"])
+@bp.route("/api/book", methods=["POST"])
 def book_ticket():
     data = request.json
-    movie_id = int(data.get("movie_id"))
+    try:
+        movie_id = int(data.get("movie_id"))
+    except (TypeError, ValueError):
+        return jsonify({"message": "movie_id must be an integer"}), 400
     date = data.get("date")
     time = data.get("time")
     seats = data.get("seats") or []
@@ -261,133 +353,472 @@ def book_ticket():
     email = data.get("email")
     phone = data.get("phone")
 
-    # Fetch all movies sorted by id for binary search
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT * FROM movies ORDER BY id")
-    movies = [
+    movie = find_movie(movie_id)
+    if not movie:
+        return jsonify({"message": "Movie not found"}), 404
+
+    if not date or not time:
+        return jsonify({"message": "Date and time are required"}), 400
+    key = SeatIndex.show_key(movie_id, date, time)
+    c = get_db().cursor()
+    show = schedule.find_show(c, key)
+    error = show_error(show)
+    if error:
+        return error
+    layout = layout_store.get(c, show["screen_id"])
+    error = validate_seats(seats, layout)
+    if error:
+        return jsonify({"message": error}), 400
+
+    # Optimize seats if not selected; retry if another buyer takes them first
+    attempts = 1 if seats else MAX_AUTO_ASSIGN_RETRIES
+    for attempt in range(attempts):
+        chosen = seats or heap_optimize_seats(movie_id, date, time, 1)
+        if not chosen:
+            return jsonify({"message": "Show is sold out"}), 409
+        booking = {
+            "movie_title": movie["title"],
+            "name": name,
+            "email": email,
+            "phone": phone,
+            "total": layout.price(chosen, movie["price"]),
+            "user_id": session.get("id"),
+        }
+        try:
+            booking_id = reservations.book_seats(get_db(), key, chosen, booking, seats_changed)
+            break
+        except SeatConflict as e:
+            if attempt == attempts - 1:
+                return jsonify({"message": str(e), "conflicts": e.seats}), 409
+            # Another worker took them; catch up before picking again
+            sync_state()
+
+    sync_state()
+
+    return jsonify(
+        {"message": "Booking confirmed!", "seats": chosen, "booking_id": booking_id}
+    )
+
+
+# Check a batch of bookings as it streams in and pick seats for items that
+# give a count. Returns ([(key, seats, booking)], errors).
+def validate_booking_batch(items):
+    c = get_db().cursor()
+    shows, claimed = {}, {}
+    valid, errors = [], []
+    for i, item in enumerate(items):
+        if i == MAX_BATCH_BOOKINGS:
+            errors.append({"index": i, "error": f"At most {MAX_BATCH_BOOKINGS} bookings per batch"})
+            break
+        if not isinstance(item, dict):
+            errors.append({"index": i, "error": "Booking must be an object"})
+            continue
+        try:
+            key = SeatIndex.show_key(item.get("movie_id"), item.get("date"), item.get("time"))
+        except (TypeError, ValueError):
+            errors.append({"index": i, "error": "movie_id must be an integer"})
+            continue
+        # Same rule as /api/book and /api/hold: JSON integers, never coerced
+        seats, count = item.get("seats") or [], item.get("count") or 0
+        if not isinstance(seats, list) or not all(map(is_integer, seats)) or not is_integer(count):
+            errors.append({"index": i, "error": "seats must be a list of integers and count an integer"})
+            continue
+        if key not in shows:
+            shows[key] = schedule.find_show(c, key)
+        show, movie = shows[key], find_movie(key[0])
+        layout = show and layout_store.get(c, show["screen_id"])
+        taken = claimed.get(key, 0)
+        if not movie:
+            error = "Movie not found"
+        elif not show:
+            error = "Show not found"
+        elif schedule.has_started(show):
+            error = "Show has already started"
+        elif seats:
+            error = validate_seats(seats, layout)
+        elif count > 0:
+            seats = layout.allocate(get_seat_index().occupied(key) | taken, count)
+            error = None if len(seats) == count else "Not enough seats available"
+        else:
+            error = "Seats or a count is required"
+        mask = 0 if error else sum(1 << s for s in seats)
+        if taken & mask:
+            error = "Seats requested twice in this batch"
+        if error:
+            errors.append({"index": i, "error": error})
+            continue
+        claimed[key] = taken | mask
+        booking = {
+            "movie_title": movie["title"],
+            "name": item.get("name"),
+            "email": item.get("email"),
+            "phone": item.get("phone"),
+            "total": layout.price(seats, movie["price"]),
+            "user_id": session.get("id"),
+        }
+        valid.append((key, seats, booking))
+    return valid, errors
+
+
+# Book many seat sets, across any number of shows, in one transaction.
+# Body: a JSON array or NDJSON of {movie_id, date, time, seats or count,
+# name, email, phone}. Every item is checked before anything is written;
+# if any item fails nothing is booked and each failure is reported by index.
+@bp.route("/api/book/batch", methods=["POST"])
+def book_batch():
+    try:
+        items, errors = validate_booking_batch(ingest.iter_request_items(request))
+    except ingest.BodyError as e:
+        return jsonify({"message": str(e)}), 400
+    if errors:
+        return jsonify({"message": "Invalid bookings", **failure_report(errors)}), 400
+    if not items:
+        return jsonify({"message": "No bookings given"}), 400
+
+    try:
+        booking_ids = reservations.book_batch(get_db(), items, seats_changed)
+    except BatchConflict as e:
+        return jsonify({"message": str(e), **failure_report(e.failures)}), 409
+
+    sync_state()
+    return jsonify(
         {
-            "id": row[0],
-            "title": row[1],
-            "genre": row[2],
-            "duration": row[3],
-            "price": row[4],
+            "message": f"{len(items)} bookings confirmed!",
+            "bookings": [
+                {"index": i, "booking_id": booking_id, "seats": seats}
+                for i, (booking_id, (_, seats, _)) in enumerate(zip(booking_ids, items))
+            ],
         }
-        for row in c.fetchall()
-    ]
-    conn.close()
+    )
 
-    movie = binary_search_movie(movies, movie_id)
-    if not movie:
+
+@bp.route("/api/hold", methods=["POST"])
+def hold_seats():
+    data = request.json
+    try:
+        movie_id = int(data.get("movie_id"))
+    except (TypeError, ValueError):
+        return jsonify({"message": "movie_id must be an integer"}), 400
+    count = data.get("count", 1)
+    if not is_integer(count):
+        return jsonify({"message": "count must be an integer"}), 400
+    date = data.get("date")
+    time = data.get("time")
+    seats = data.get("seats") or []
+
+    if not find_movie(movie_id):
         return jsonify({"message": "Movie not found"}), 404
 
-    # Total price
-    total = len(seats) * movie["price"] if seats else movie["price"]
+    if not date or not time:
+        return jsonify({"message": "Date and time are required"}), 400
+    if count < 1:
+        return jsonify({"message": "Count must be at least 1"}), 400
+    key = SeatIndex.show_key(movie_id, date, time)
+    c = get_db().cursor()
+    show = schedule.find_show(c, key)
+    error = show_error(show)
+    if error:
+        return error
+    layout = layout_store.get(c, show["screen_id"])
+    error = validate_seats(seats, layout)
+    if error:
+        return jsonify({"message": error}), 400
+
+    attempts = 1 if seats else MAX_AUTO_ASSIGN_RETRIES
+    for attempt in range(attempts):
+        chosen = seats or heap_optimize_seats(movie_id, date, time, count)
+        if len(chosen) < (len(seats) or count):
+            return jsonify({"message": "Not enough seats available"}), 409
+        try:
+            hold = reservations.create_hold(get_db(), key, chosen, on_change=seats_changed)
+            break
+        except SeatConflict as e:
+            if attempt == attempts - 1:
+                return jsonify({"message": str(e), "conflicts": e.seats}), 409
+            # Another worker took them; catch up before picking again
+            sync_state()
+
+    sync_state()
+    return jsonify(hold)
+
+
+@bp.route("/api/hold/<hold_id>/confirm", methods=["POST"])
+def confirm_hold(hold_id):
+    data = request.json or {}
+    conn = get_db()
+    try:
+        hold = reservations.get_hold(conn, hold_id)
+        movie = find_movie(hold["key"][0])
+        if not movie:
+            return jsonify({"message": "Movie not found"}), 404
+        error = show_error(schedule.find_show(conn.cursor(), hold["key"]))
+        if error:
+            return error
+        booking = {
+            "movie_title": movie["title"],
+            "name": data.get("name"),
+            "email": data.get("email"),
+            "phone": data.get("phone"),
+            "total": get_show_layout(hold["key"]).price(hold["seats"], movie["price"]),
+            "user_id": session.get("id"),
+        }
+        booking_id, seats = reservations.confirm_hold(conn, hold_id, booking, seats_changed)
+    except HoldNotFound:
+        return jsonify({"message": "Hold expired or not found"}), 410
 
-    # Optimize seats if not selected
-    if not seats:
-        seats = heap_optimize_seats(movie_id, date, time, 1)
-        total = len(seats) * movie["price"]
+    sync_state()
+    return jsonify(
+        {"message": "Booking confirmed!", "seats": seats, "booking_id": booking_id}
+    )
 
-    seats_str = ",".join(map(str, seats))
 
-    # Insert booking
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(
-        """
-        INSERT INTO bookings (movie_id, movie_title, date, time, seats, name, email, phone, total, status)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """,
-        (
-            movie_id,
-            movie["title"],
-            date,
-            time,
-            seats_str,
-            name,
-            email,
-            phone,
-            total,
-            "Confirmed",
-        ),
+@bp.route("/api/hold/<hold_id>", methods=["DELETE"])
+def release_hold(hold_id):
+    try:
+        reservations.release_hold(get_db(), hold_id, seats_changed)
+    except HoldNotFound:
+        return jsonify({"message": "Hold expired or not found"}), 404
+
+    sync_state()
+    return jsonify({"message": "Hold released."})
+
+
+@bp.route("/api/shows/<int:movie_id>/<date>/<time>/seats", methods=["GET"])
+def get_show_seats(movie_id, date, time):
+    index = get_seat_index()
+    key = SeatIndex.show_key(movie_id, date, time)
+    # Taken before the seats are read; the client passes it to /events
+    last_event_id = broker.cursor(key)
+    c = get_db().cursor()
+    show = schedule.find_show(c, key)
+    if not show:
+        return jsonify({"message": "Show not found"}), 404
+    layout = layout_store.get(c, show["screen_id"])
+    return jsonify(
+        {
+            "show_id": show["id"],
+            "movie_id": movie_id,
+            "date": date,
+            "time": time,
+            "total_seats": layout.sellable,
+            "booked": index.booked(key),
+            "held": index.held(key),
+            "available": layout.free_count(index.occupied(key)),
+            "screen": layout.to_json(),
+            "last_event_id": last_event_id,
+        }
     )
-    conn.commit()
-    conn.close()
 
-    return jsonify({"message": "Booking confirmed!", "seats": seats})
 
+# ?movie_id=&screen_id=&date= (or date_from=&date_to=) filter; upcoming=1
+# hides shows that have started, available=1 hides sold-out shows
+@bp.route("/api/shows", methods=["GET"])
+def list_shows():
+    args = request.args
+    return jsonify(
+        schedule.list_shows(
+            get_db().cursor(),
+            movie_id=args.get("movie_id", type=int),
+            screen_id=args.get("screen_id", type=int),
+            date=args.get("date"),
+            date_from=args.get("date_from"),
+            date_to=args.get("date_to"),
+            upcoming=args.get("upcoming") == "1",
+            available=args.get("available") == "1",
+        )
+    )
 
-@app.route("/api/bookings", methods=["GET"])
-def get_bookings():
-    search = request.args.get("search", "").lower()
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+
+@bp.route("/api/shows/<int:show_id>", methods=["GET"])
+def get_show(show_id):
+    show = schedule.get_show(get_db().cursor(), show_id)
+    if not show:
+        return jsonify({"message": "Show not found"}), 404
+    return jsonify(show)
+
+
+# Server-Sent Events stream of held/booked/released seat deltas for one show.
+# The generator does not touch the database, so the pooled connection goes
+# back when the view returns rather than when the stream ends.
+@bp.route("/api/shows/<int:show_id>/events", methods=["GET"])
+def show_events(show_id):
+    show = schedule.get_show(get_db().cursor(), show_id)
+    if not show:
+        return jsonify({"message": "Show not found"}), 404
+    key = SeatIndex.show_key(show["movie_id"], show["date"], show["time"])
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+
+    # Registered here, so events published before the stream is first read
+    # are kept for it (the app context is gone by then, too)
+    listener = broker.listen(key, last_id)
+
+    def stream():
+        yield f"retry: {events.RETRY_MILLISECONDS}\n\n"
+        for item in listener:
+            yield events.format_sse(item)
+
+    response = Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    response.call_on_close(listener.close)
+    return response
+
+
+@bp.route("/api/screens", methods=["GET"])
+def list_screens():
+    c = get_db().cursor()
+    c.execute("SELECT id, name, rows, cols FROM screens ORDER BY id")
+    return jsonify(
+        [{"id": r[0], "name": r[1], "rows": r[2], "cols": r[3]} for r in c.fetchall()]
+    )
+
+
+@bp.route("/api/screens/<int:screen_id>", methods=["GET"])
+def get_screen(screen_id):
+    layout = layout_store.get(get_db().cursor(), screen_id)
+    if not layout:
+        return jsonify({"error": "Screen not found"}), 404
+    return jsonify(layout.to_json())
+
+
+BOOKING_COLUMNS = (
+    "id",
+    "movie_id",
+    "movie_title",
+    "date",
+    "time",
+    "seats",
+    "name",
+    "email",
+    "phone",
+    "total",
+    "status",
+    "user_id",
+)
+BOOKING_SELECT = f"SELECT {', '.join(BOOKING_COLUMNS)} FROM bookings"
+
+
+def booking_from_row(row):
+    b = dict(zip(BOOKING_COLUMNS, row))
+    b["seats"] = b["seats"].split(",") if b["seats"] else []
+    return b
+
+
+# Build the WHERE clause for the bookings listing from query parameters
+def booking_filters(args):
+    clauses, params = [], []
+
+    search = args.get("search", "").lower()
     if search:
-        c.execute(
-            "SELECT * FROM bookings WHERE LOWER(email) LIKE ? OR phone LIKE ?",
-            (f"%{search}%", f"%{search}%"),
+        # Prefix match as index range scans on email (case-insensitive) and phone
+        upper = search + "\uffff"
+        clauses.append(
+            "((email >= ? COLLATE NOCASE AND email < ? COLLATE NOCASE)"
+            " OR (phone >= ? AND phone < ?))"
         )
-    else:
-        c.execute("SELECT * FROM bookings")
-
-    bookings = []
-    analytics = {"total_bookings_per_movie": {}, "total_revenue_per_movie": {}}
-    for row in c.fetchall():
-        b = {
-            "id": row[0],
-            "movie_id": row[1],
-            "movie_title": row[2],
-            "date": row[3],
-            "time": row[4],
-            "seats": row[5].split(","),
-            "name": row[6],
-            "email": row[7],
-            "phone": row[8],
-            "total": row[9],
-            "status": row[10],
-        }
-        bookings.append(b)
-        # Analytics
-        analytics["total_bookings_per_movie"][b["movie_title"]] = analytics[
-            "total_bookings_per_movie"
-        ].get(b["movie_title"], 0) + len(b["seats"])
-        analytics["total_revenue_per_movie"][b["movie_title"]] = (
-            analytics["total_revenue_per_movie"].get(b["movie_title"], 0) + b["total"]
+        params += [search, upper, search, upper]
+
+    user_id = args.get("user_id") or args.get("userId")
+    if user_id:
+        clauses.append("user_id = ?")
+        params.append(user_id)
+    if args.get("movie_id"):
+        clauses.append("movie_id = ?")
+        params.append(args.get("movie_id"))
+    if args.get("date_from"):
+        clauses.append("date >= ?")
+        params.append(args.get("date_from"))
+    if args.get("date_to"):
+        clauses.append("date <= ?")
+        params.append(args.get("date_to"))
+    if args.get("status"):
+        clauses.append("status = ?")
+        params.append(args.get("status"))
+
+    return clauses, params
+
+
+# Keyset-paginated bookings: ?after_id=&limit= plus filters.
+# ?format=ndjson streams every matching row instead of one page.
+@bp.route("/api/bookings", methods=["GET"])
+def get_bookings():
+    clauses, params = booking_filters(request.args)
+    c = get_db().cursor()
+
+    after_id = request.args.get("after_id", type=int)
+    page_clauses = clauses + (["id > ?"] if after_id else [])
+    page_params = params + ([after_id] if after_id else [])
+    where = f"WHERE {' AND '.join(page_clauses)}" if page_clauses else ""
+
+    if request.args.get("format") == "ndjson":
+        c.execute(f"{BOOKING_SELECT} {where} ORDER BY id", page_params)
+
+        def generate():
+            while True:
+                rows = c.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                yield "".join(json.dumps(booking_from_row(row)) + "\n" for row in rows)
+
+        return Response(
+            stream_with_context(generate()), mimetype="application/x-ndjson"
         )
 
-    conn.close()
-    return jsonify({"bookings": bookings, "analytics": analytics})
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    c.execute(f"{BOOKING_SELECT} {where} ORDER BY id LIMIT ?", page_params + [limit])
+    bookings = [booking_from_row(row) for row in c.fetchall()]
+    next_after_id = bookings[-1]["id"] if len(bookings) == limit else None
 
+    return jsonify({"bookings": bookings, "next_after_id": next_after_id})
 
-@app.route("/api/cancel_booking/<int:booking_id>", methods=["DELETE"])
+
+@bp.route("/api/cancel_booking/<int:booking_id>", methods=["DELETE"])
 def cancel_booking(booking_id):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-
-    # Check if booking exists
-    c.execute("SELECT status FROM bookings WHERE id=?", (booking_id,))
-    result = c.fetchone()
-    if not result:
-        conn.close()
-        return jsonify({"error": "Booking not found"}), 404
-
-    status = result[0]
-    if status == "Cancelled":
-        conn.close()
-        return jsonify({"message": "Booking is already cancelled."}), 200
-
-    # Mark booking as cancelled
-    c.execute("UPDATE bookings SET status='Cancelled' WHERE id=?", (booking_id,))
-    conn.commit()
-    conn.close()
+    with transaction(get_db()) as c:
+        # Check if booking exists
+        c.execute(
+            "SELECT status, movie_id, movie_title, date, time, seats, total FROM bookings WHERE id=?",
+            (booking_id,),
+        )
+        result = c.fetchone()
+        if not result:
+            return jsonify({"error": "Booking not found"}), 404
+
+        status, movie_id, movie_title, date, time, seats, total = result
+        if status == "Cancelled":
+            return jsonify({"message": "Booking is already cancelled."}), 200
+
+        # Mark booking as cancelled and free its seats
+        c.execute("UPDATE bookings SET status='Cancelled' WHERE id=?", (booking_id,))
+        c.execute("DELETE FROM booking_seats WHERE booking_id=?", (booking_id,))
+        schedule.record_sale(c, (movie_id, date, time), -c.rowcount)
+        if movie_id is not None and date and time and seats:
+            analytics.record_cancellation(
+                c,
+                (movie_id, date, time),
+                movie_title,
+                len(seats.split(",")),
+                total or 0,
+            )
+        if movie_id is not None and seats:
+            seats_changed(
+                c,
+                "release",
+                SeatIndex.show_key(movie_id, date, time),
+                [int(s) for s in seats.split(",") if s.strip()],
+            )
+
+    sync_state()
     return jsonify({"message": "Booking cancelled successfully!"})
 
 
 # ------------------ Admin API Routes ------------------
 
 
-@app.route("/api/admin/add_movie", methods=["POST"])
+@bp.route("/api/admin/add_movie", methods=["POST"])
 def add_movie():
     # Allow only admin role
     if "role" not in session or session["role"] != "admin":
@@ -400,20 +831,298 @@ def add_movie():
     price = data.get("price")
 
     # Validation
-    if not title or not genre or not duration or not price:
+    if not title or not genre or not duration or price in (None, ""):
         return jsonify({"error": "All fields are required"}), 400
-
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    duration_minutes = parse_duration(duration)
+    if duration_minutes is None:
+        return jsonify({"error": "Duration must look like '148 min' or '2h 28m'"}), 400
+    price = parse_price(price)
+    if price is None or price < 0:
+        return jsonify({"error": "Price must be a whole number"}), 400
+
+    c = get_db().cursor()
     c.execute(
-        "INSERT INTO movies (title, genre, duration, price) VALUES (?, ?, ?, ?)",
-        (title, genre, duration, price),
+        "INSERT INTO movies (title, genre, duration, price, duration_minutes) VALUES (?, ?, ?, ?, ?)",
+        (title, genre, duration, price, duration_minutes),
     )
-    conn.commit()
-    conn.close()
+    get_state().catalog_changed(get_db())
 
     return jsonify({"message": f'Movie "{title}" added successfully!'})
 
 
+# Load many movies in one transaction from a JSON array, NDJSON or CSV
+# (title,genre,duration,price) body. Nothing is written if any row is
+# invalid; titles already in the catalog are skipped.
+@bp.route("/api/admin/movies/bulk", methods=["POST"])
+def bulk_add_movies():
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    existing = [m["title"] for m in catalog.movies(get_db())]
+    try:
+        rows, errors, skipped = validate_movies(
+            ingest.iter_request_items(request, allow_csv=True), existing
+        )
+    except ingest.BodyError as e:
+        return jsonify({"error": str(e)}), 400
+    if errors:
+        return jsonify({"error": "Invalid movies", **failure_report(errors)}), 400
+
+    with transaction(get_db()) as c:
+        insert_movies(c, rows)
+    get_state().catalog_changed(get_db())
+
+    return jsonify(
+        {"message": f"{len(rows)} movies added.", "created": len(rows), "skipped": skipped}
+    )
+
+
+@bp.route("/api/admin/analytics", methods=["GET"])
+def admin_analytics():
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    return jsonify(
+        analytics.summary(
+            get_db().cursor(),
+            date_from=request.args.get("date_from"),
+            date_to=request.args.get("date_to"),
+            include_shows=request.args.get("shows") == "1",
+        )
+    )
+
+
+# Create a screen from row strings ({"name", "layout": ["SS_SS", ...]}) or
+# a plain grid ({"name", "rows", "cols"})
+@bp.route("/api/admin/screens", methods=["POST"])
+def add_screen():
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    data = request.json
+    name = data.get("name")
+    rows = data.get("layout")
+    if rows is None and data.get("rows") and data.get("cols"):
+        rows = layouts.grid_rows(int(data["rows"]), int(data["cols"]))
+    if not name:
+        return jsonify({"error": "Screen name is required"}), 400
+
+    with transaction(get_db()) as c:
+        error = layouts.validate_rows(rows, layout_store.multipliers(c))
+        if error:
+            return jsonify({"error": error}), 400
+        screen_id = layouts.create_screen(c, name, rows)
+
+    return jsonify({"message": f'Screen "{name}" added successfully!', "id": screen_id})
+
+
+# Add shows in one transaction. Accepts a JSON array (or {"shows": [...]})
+# of {movie_id, screen_id, date, time}; if any item is invalid nothing is
+# written and every failure is reported. Existing shows are skipped.
+@bp.route("/api/admin/shows", methods=["POST"])
+def import_shows():
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    data = request.json
+    items = data.get("shows") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty list of shows"}), 400
+    return add_shows(items)
+
+
+# Generate one show per movie, date and showtime on a screen:
+# {screen_id, date_from, date_to, movie_ids?, times?}
+@bp.route("/api/admin/shows/generate", methods=["POST"])
+def generate_shows():
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    data = request.json
+    try:
+        dates = schedule.date_range(data.get("date_from"), data.get("date_to"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "date_from and date_to must be YYYY-MM-DD"}), 400
+    if not 0 < len(dates) <= schedule.MAX_GENERATE_DAYS:
+        return jsonify({"error": f"Date range must cover 1 to {schedule.MAX_GENERATE_DAYS} days"}), 400
+
+    if not layout_store.get(get_db().cursor(), data.get("screen_id")):
+        return jsonify({"error": "Screen not found"}), 404
+    movie_ids = data.get("movie_ids") or [m["id"] for m in catalog.movies(get_db())]
+    times = data.get("times") or schedule.DEFAULT_SHOWTIMES
+    return add_shows(
+        schedule.generate_schedule(movie_ids, data.get("screen_id"), dates, times)
+    )
+
+
+def add_shows(items):
+    movie_ids = {m["id"] for m in catalog.movies(get_db())}
+    with transaction(get_db()) as c:
+        rows, errors = schedule.validate_schedule(
+            items, movie_ids, layout_store.capacities(c)
+        )
+        if errors:
+            return jsonify({"error": "Invalid shows", "failures": errors}), 400
+        created = schedule.insert_shows(c, rows)
+
+    return jsonify(
+        {
+            "message": f"{created} shows added.",
+            "created": created,
+            "skipped": len(rows) - created,
+        }
+    )
+
+
+# Move a show to another screen; only allowed before anything is sold
+@bp.route("/api/admin/show_screen", methods=["POST"])
+def assign_show_screen():
+    if "role" not in session or session["role"] != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+
+    data = request.json
+    key = SeatIndex.show_key(data.get("movie_id"), data.get("date"), data.get("time"))
+    screen_id = data.get("screen_id")
+
+    with transaction(get_db()) as c:
+        layout = layout_store.get(c, screen_id)
+        if not layout:
+            return jsonify({"error": "Screen not found"}), 404
+        show = schedule.find_show(c, key)
+        if not show:
+            return jsonify({"error": "Show not found"}), 404
+        # Seat numbers only mean something on the screen they were sold for
+        if show["seats_sold"] or reservations.has_live_holds(c, key):
+            return jsonify({"error": "Show already has bookings"}), 409
+        c.execute(
+            "UPDATE shows SET screen_id=?, capacity=? WHERE id=?",
+            (screen_id, layout.sellable, show["id"]),
+        )
+
+    return jsonify({"message": "Screen assigned."})
+
+
+# ------------------ Metrics ------------------
+
+
+# Prometheus text exposition of request, SQL and pool metrics, summed over
+# every worker process; this worker's own numbers are stored first
+@bp.route("/metrics")
+def metrics_endpoint():
+    conn = get_db()
+    shared.save_metrics(conn)
+    return Response(metrics.render(shared.load_metrics(conn)), mimetype="text/plain; version=0.0.4")
+
+
+# Collapsed stacks of a request profiled with the X-Profile header
+@bp.route("/metrics/profiles/<profile_id>")
+def metrics_profile(profile_id):
+    profile = metrics.get_profile(profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return Response(profile, mimetype="text/plain")
+
+
+# ------------------ CLI Commands ------------------
+
+
+@bp.cli.group("db")
+def db_cli():
+    """Create, upgrade and seed the database."""
+
+
+@db_cli.command("init")
+def db_init_command():
+    """Create the schema or upgrade it to the latest version."""
+    # The app factory has usually run the migrations already
+    with get_pool().connection() as conn:
+        applied = get_state().migrations_applied + migrate(conn)
+    if applied:
+        print(f"Migrated to v{LATEST_VERSION}: applied {applied}")
+    else:
+        print(f"Schema is up to date (v{LATEST_VERSION})")
+
+
+@db_cli.command("seed")
+def db_seed_command():
+    """Add the admin account, sample movies and a week of shows if missing."""
+    seed(get_pool())
+    print("Seeded")
+
+
+@bp.cli.command("rebuild-analytics")
+def rebuild_analytics_command():
+    """Recompute sales aggregates from bookings and report any drift."""
+    with get_pool().connection() as conn, transaction(conn) as c:
+        before = analytics.snapshot(c)
+        analytics.rebuild(c)
+        after = analytics.snapshot(c)
+
+    for table in after:
+        drift = len(set(before[table]) ^ set(after[table]))
+        print(f"{table}: {len(after[table])} rows, {drift} differed before rebuild")
+
+
+@bp.cli.command("generate-shows")
+@click.option("--days", default=SEED_SCHEDULE_DAYS, help="Number of days from today.")
+@click.option("--screen", "screen_id", default=DEFAULT_SCREEN_ID, help="Screen id.")
+def generate_shows_command(days, screen_id):
+    """Schedule the default showtimes for every movie on one screen."""
+    dates = schedule.upcoming_dates(days)
+    with get_pool().connection() as conn, transaction(conn) as c:
+        c.execute("SELECT id FROM movies")
+        movie_ids = [row[0] for row in c.fetchall()]
+        rows, errors = schedule.validate_schedule(
+            schedule.generate_schedule(movie_ids, screen_id, dates),
+            set(movie_ids),
+            layout_store.capacities(c),
+        )
+        created = schedule.insert_shows(c, rows)
+    print(f"{created} shows added, {len(rows) - created} already scheduled, {len(errors)} rejected")
+
+
+# ------------------ App Factory ------------------
+
+
+# WSGI entry point: `flask --app app run` for development, serve.py (or any
+# WSGI server, e.g. gunicorn "app:create_app()") for production.
+# DATABASE=":memory:" gives a private throwaway database; READ_ONLY workers
+# never run DDL and refuse to start on an outdated schema; TESTING apps do
+# not start the background threads.
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config.from_mapping(
+        # Sessions live in the database, so workers need not share a key
+        SECRET_KEY=os.environ.get("CINEBOOK_SECRET_KEY") or secrets.token_hex(32),
+        DATABASE=DB_FILE,
+        DB_POOL_SIZE=db.POOL_SIZE,
+        READ_ONLY=os.environ.get("CINEBOOK_READ_ONLY") == "1",
+    )
+    app.config.update(config or {})
+
+    pool = db.init_app(
+        app, app.config["DATABASE"], app.config["DB_POOL_SIZE"], factory=metrics.TracedConnection
+    )
+    metrics.init_app(app)
+    applied = bootstrap_db(pool, read_only=app.config["READ_ONLY"])
+
+    state = AppState(pool)
+    state.migrations_applied = applied
+    app.extensions["cinebook"] = state
+    app.session_interface = shared.SessionStore()
+    app.before_request(sync_workers)
+    app.register_blueprint(bp)
+    if not app.testing:
+        state.start()
+    return app
+
+
+# Apply changes other workers made before serving a request, so a client
+# never sees older seat maps or catalog than its previous request did
+def sync_workers():
+    if request.endpoint != "static":
+        sync_state()
+
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
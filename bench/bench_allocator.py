@@ -0,0 +1,111 @@
+"""Time best-seat allocation on large, mostly full auditoriums.
+
+    python bench/bench_allocator.py --seats 1000 --fill 0.9
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from layouts import DEFAULT_CLASSES, Layout  # noqa: E402
+
+MULTIPLIERS = {code: multiplier for code, _name, multiplier in DEFAULT_CLASSES}
+
+
+# A rows x cols hall with two aisles and premium seats in the back third
+def make_rows(seats):
+    cols = 40 if seats >= 1000 else 10
+    rows = max(seats // cols, 1)
+    result = []
+    for r in range(rows):
+        code = "P" if r >= rows * 2 // 3 else "S"
+        third = cols // 3
+        result.append(code * third + "_" + code * (cols - 2 * third) + "_" + code * third)
+    return result
+
+
+# Every seat tried in turn: the allocator the block search replaced
+def brute_force(layout, occupied, n):
+    taken = occupied | layout.blocked_mask
+    best_score, best = None, None
+    for seg in layout.segments:
+        for start in range(seg.length - n + 1):
+            window = ((1 << n) - 1) << (seg.first + start)
+            if taken & window:
+                continue
+            score = seg.window_score(start, n)
+            if best_score is None or score < best_score:
+                best_score, best = score, seg.first + start
+    return None if best is None else list(range(best, best + n))
+
+
+def score(layout, block):
+    return None if block is None else sum(layout.scores[s] for s in block)
+
+
+def fill(layout, fraction, rng):
+    seats = rng.sample(range(1, layout.capacity + 1), int(layout.capacity * fraction))
+    occupied = 0
+    for seat in seats:
+        occupied |= 1 << seat
+    return occupied
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seats", type=int, nargs="+", default=[50, 1000, 5000])
+    parser.add_argument("--fill", type=float, nargs="+", default=[0.0, 0.5, 0.9])
+    parser.add_argument("--party", type=int, nargs="+", default=[1, 2, 4, 6])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = []
+    print(f"{'seats':>6}{'fill':>6}{'party':>7}{'brute ms':>11}{'block ms':>11}  same")
+    for seats in args.seats:
+        layout = Layout(0, "bench", make_rows(seats), MULTIPLIERS)
+        for fraction in args.fill:
+            occupied = fill(layout, fraction, rng)
+            for n in args.party:
+                old = timed(lambda: brute_force(layout, occupied, n), max(args.repeat // 10, 1))
+                new = timed(lambda: layout.allocate(occupied, n), args.repeat)
+                # Ties between mirror-image blocks may pick either side
+                same = score(layout, layout.best_block(occupied, n)) == score(
+                    layout, brute_force(layout, occupied, n)
+                )
+                report.append(
+                    {
+                        "seats": layout.capacity,
+                        "fill": fraction,
+                        "party": n,
+                        "brute_force_ms": old,
+                        "allocate_ms": new,
+                        "same_block": same,
+                    }
+                )
+                print(f"{layout.capacity:>6}{fraction:>6.1f}{n:>7}{old:>11.3f}{new:>11.3f}  {same}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if not all(r["same_block"] for r in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Compare the catalog query engine with the old recursive quick sort.
+
+    python bench/bench_catalog.py --movies 1000 10000 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog import _CatalogData, parse_sort  # noqa: E402
+
+GENRES = ["Action", "Drama", "Sci-Fi", "Crime", "Comedy", "Horror"]
+SYLLABLES = ["ka", "ri", "mon", "tel", "vor", "an", "sil", "dra", "qu", "ex", "lo", "ne"]
+
+
+# The implementation /api/movies used before the catalog engine
+def quick_sort_movies(arr, key):
+    if len(arr) <= 1:
+        return arr
+    pivot = arr[len(arr) // 2]
+    left = [x for x in arr if x[key] < pivot[key]]
+    middle = [x for x in arr if x[key] == pivot[key]]
+    right = [x for x in arr if x[key] > pivot[key]]
+    return quick_sort_movies(left, key) + middle + quick_sort_movies(right, key)
+
+
+def make_movies(n, rng, presorted=False):
+    words = ["".join(rng.sample(SYLLABLES, 3)) for _ in range(2000)]
+    movies = []
+    for i in range(1, n + 1):
+        minutes = rng.randint(80, 200)
+        movies.append(
+            {
+                "id": i,
+                "title": " ".join(rng.sample(words, 3)).title(),
+                "genre": rng.choice(GENRES),
+                "duration": f"{minutes} min",
+                "price": rng.choice([150, 200, 250, 300]),
+                "duration_minutes": minutes,
+            }
+        )
+    if presorted:
+        movies.sort(key=lambda m: m["price"])
+    return movies
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def bench(n, repeat, rng, presorted):
+    movies = make_movies(n, rng, presorted)
+    data = _CatalogData(movies)
+    needle = movies[0]["title"].split()[1].lower()
+    results = {}
+
+    for field in ("price", "title", "duration"):
+        results[f"sort_{field}"] = (
+            timed(lambda: quick_sort_movies(list(movies), field), repeat),
+            timed(lambda: data.listing("", parse_sort(field)), repeat),
+        )
+    results["genre_sort_price"] = (
+        timed(
+            lambda: quick_sort_movies(
+                [m for m in movies if m["genre"].lower() == "drama"], "price"
+            ),
+            repeat,
+        ),
+        timed(lambda: data.listing("drama", parse_sort("price")), repeat),
+    )
+    results["multi_key_price_desc_title"] = (
+        None,
+        timed(lambda: data.listing("", parse_sort("-price,title")), repeat),
+    )
+    results["title_search"] = (
+        timed(lambda: [m for m in movies if needle in m["title"].lower()], repeat),
+        timed(lambda: data.listing("", (), needle), repeat),
+    )
+    results["index_build"] = (None, timed(lambda: _CatalogData(movies), 1))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--movies", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    # The old sort compared duration strings, so "99 min" sorted last
+    sample = [{"duration": d} for d in ("148 min", "99 min", "152 min")]
+    print("old duration order:", [m["duration"] for m in quick_sort_movies(sample, "duration")])
+
+    report = {}
+    for n in args.movies:
+        for presorted in (False, True):
+            label = f"{n} movies{' (presorted)' if presorted else ''}"
+            results = bench(n, args.repeat, random.Random(args.seed), presorted)
+            report[label] = results
+            print(f"\n{label}")
+            print(f"  {'query':<28}{'old ms':>10}{'new ms':>10}")
+            for name, (old, new) in results.items():
+                old_text = f"{old:>10.3f}" if old is not None else f"{'-':>10}"
+                print(f"  {name:<28}{old_text}{new:>10.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Compare booking lookups before and after the schema migrations.
+
+Seeds a database with the original unindexed schema, times the lookups the
+app runs, then migrates a copy in place and times the indexed equivalents.
+
+    python bench/bench_indexes.py --bookings 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db import show_key  # noqa: E402
+from migrations import migrate  # noqa: E402
+
+SHOWTIMES = ["10:00 AM", "01:00 PM", "04:00 PM", "07:00 PM", "10:00 PM"]
+MOVIES = 50
+DAYS = 60
+CUSTOMERS = 50000
+
+
+def seed(path, bookings, rng):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE movies (
+            id INTEGER PRIMARY KEY, title TEXT NOT NULL, genre TEXT,
+            duration TEXT, price INTEGER
+        )
+    """
+    )
+    conn.execute(
+        """
+        CREATE TABLE bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, movie_id INTEGER,
+            movie_title TEXT, date TEXT, time TEXT, seats TEXT, name TEXT,
+            email TEXT, phone TEXT, total INTEGER, status TEXT
+        )
+    """
+    )
+    conn.executemany(
+        "INSERT INTO movies VALUES (?, ?, 'Drama', '120 min', 200)",
+        [(i, f"Movie {i}") for i in range(1, MOVIES + 1)],
+    )
+
+    def rows():
+        for _ in range(bookings):
+            movie_id = rng.randint(1, MOVIES)
+            customer = rng.randrange(CUSTOMERS)
+            seats = rng.sample(range(1, 51), rng.randint(1, 4))
+            yield (
+                movie_id,
+                f"Movie {movie_id}",
+                f"2030-01-{rng.randrange(DAYS):02d}",
+                rng.choice(SHOWTIMES),
+                ",".join(map(str, seats)),
+                f"Customer {customer}",
+                f"user{customer}@example.com",
+                f"9{customer:09d}",
+                len(seats) * 200,
+                "Cancelled" if rng.random() < 0.1 else "Confirmed",
+            )
+
+    conn.executemany(
+        """
+        INSERT INTO bookings (movie_id, movie_title, date, time, seats, name, email, phone, total, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+        rows(),
+    )
+    conn.commit()
+    conn.close()
+
+
+def timed(conn, sql, params_list):
+    start = time.perf_counter()
+    for params in params_list:
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) * 1000 / len(params_list)
+
+
+def run_queries(conn, migrated, rng, repeat):
+    shows = [
+        (rng.randint(1, MOVIES), f"2030-01-{rng.randrange(DAYS):02d}", rng.choice(SHOWTIMES))
+        for _ in range(repeat)
+    ]
+    customers = [rng.randrange(CUSTOMERS) for _ in range(repeat)]
+    emails = [(f"USER{c}@example.com",) for c in customers]
+    phones = [(f"9{c:09d}",) for c in customers]
+    results = {}
+
+    if migrated:
+        results["show_seats"] = timed(
+            conn,
+            "SELECT seat_no FROM booking_seats WHERE show_key=?",
+            [(show_key(*s),) for s in shows],
+        )
+        results["customer_email"] = timed(
+            conn,
+            "SELECT * FROM bookings WHERE email >= ? COLLATE NOCASE AND email < ? COLLATE NOCASE",
+            [(e, e + "￿") for (e,) in emails],
+        )
+        results["customer_phone"] = timed(
+            conn,
+            "SELECT * FROM bookings WHERE phone >= ? AND phone < ?",
+            [(p, p + "￿") for (p,) in phones],
+        )
+    else:
+        results["show_seats"] = timed(
+            conn,
+            "SELECT seats FROM bookings WHERE movie_id=? AND date=? AND time=? AND status != 'Cancelled'",
+            shows,
+        )
+        results["customer_email"] = timed(
+            conn,
+            "SELECT * FROM bookings WHERE LOWER(email) LIKE ?",
+            [(f"%{e.lower()}%",) for (e,) in emails],
+        )
+        results["customer_phone"] = timed(
+            conn, "SELECT * FROM bookings WHERE phone LIKE ?", [(f"%{p}%",) for (p,) in phones]
+        )
+    results["show_bookings"] = timed(
+        conn,
+        "SELECT seats FROM bookings WHERE movie_id=? AND date=? AND time=? AND status != 'Cancelled'",
+        shows,
+    )
+    results["cancelled_count"] = timed(
+        conn, "SELECT COUNT(*) FROM bookings WHERE status='Cancelled'", [()] * repeat
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="cinebook-bench-")
+    before_path = os.path.join(tmpdir, "before.db")
+    after_path = os.path.join(tmpdir, "after.db")
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    seed(before_path, args.bookings, rng)
+    print(f"seeded {args.bookings} bookings in {time.perf_counter() - start:.1f}s")
+    shutil.copy(before_path, after_path)
+
+    conn = sqlite3.connect(before_path)
+    before = run_queries(conn, False, random.Random(args.seed), args.repeat)
+    conn.close()
+
+    conn = sqlite3.connect(after_path, isolation_level=None)
+    start = time.perf_counter()
+    migrate(conn)
+    migration_seconds = time.perf_counter() - start
+    print(f"migrated in {migration_seconds:.1f}s")
+    after = run_queries(conn, True, random.Random(args.seed), args.repeat)
+    conn.close()
+    shutil.rmtree(tmpdir)
+
+    print(f"{'query':<18}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in before:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<18}{before[name]:>12.3f}{after[name]:>12.3f}{speedup:>9.0f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "bookings": args.bookings,
+                    "migration_seconds": migration_seconds,
+                    "before_ms": before,
+                    "after_ms": after,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
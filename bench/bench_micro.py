@@ -0,0 +1,114 @@
+"""Micro-benchmarks for the seat and catalog helpers in app.py.
+
+    python bench/bench_micro.py --json micro.json
+
+Times heap_optimize_seats on empty, half-full and nearly full shows, the
+legacy quick_sort_movies against the catalog's sort_movies, and
+binary_search_movie against a dict lookup.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import timeit
+
+from benchlib import ROOT, write_report
+from bench_catalog import make_movies, quick_sort_movies
+
+FILLS = (0.0, 0.5, 0.9)
+
+
+# Per-call time in microseconds: the median and best of several rounds
+def measure(fn, rounds):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    times = [t / number * 1e6 for t in timer.repeat(rounds, number)]
+    return {"median_us": round(statistics.median(times), 3), "best_us": round(min(times), 3)}
+
+
+def bench_seats(cinebook, app, rounds, rng):
+    results = {}
+    with app.app_context():
+        show = cinebook.schedule.list_shows(cinebook.get_db().cursor(), upcoming=True)[0]
+        key = (show["movie_id"], show["date"], show["time"])
+        index = cinebook.get_seat_index()
+        capacity = show["capacity"]
+        for fill in FILLS:
+            # Occupancy only changes in the in-memory index, not the database
+            seats = rng.sample(range(1, capacity + 1), int(capacity * fill))
+            index.book(key, seats)
+            for n in (1, 4):
+                results[f"heap_optimize_seats_fill{int(fill * 100)}_n{n}"] = measure(
+                    lambda: cinebook.heap_optimize_seats(*key, n), rounds
+                )
+            index.release(key, seats)
+    return results
+
+
+def bench_sort(sizes, rounds, rng):
+    from catalog import sort_movies
+
+    results = {}
+    for size in sizes:
+        movies = make_movies(size, rng)
+        for field in ("price", "title"):
+            results[f"quick_sort_movies_{field}_{size}"] = measure(
+                lambda: quick_sort_movies(list(movies), field), rounds
+            )
+            results[f"sort_movies_{field}_{size}"] = measure(
+                lambda: sort_movies(movies, ((field, False),)), rounds
+            )
+    return results
+
+
+def bench_search(cinebook, sizes, rounds, rng):
+    results = {}
+    for size in sizes:
+        movies = make_movies(size, rng)
+        by_id = {m["id"]: m for m in movies}
+        targets = [rng.randint(1, size) for _ in range(1000)]
+        position = iter(range(10**12))
+
+        def search():
+            return cinebook.binary_search_movie(movies, targets[next(position) % 1000])
+
+        def lookup():
+            return by_id.get(targets[next(position) % 1000])
+
+        results[f"binary_search_movie_{size}"] = measure(search, rounds)
+        results[f"dict_lookup_{size}"] = measure(lookup, rounds)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import app as cinebook
+
+    app = cinebook.create_app({"DATABASE": ":memory:"})
+
+    rng = random.Random(args.seed)
+    results = {}
+    results.update(bench_seats(cinebook, app, args.rounds, rng))
+    results.update(bench_sort(args.sizes, args.rounds, rng))
+    results.update(bench_search(cinebook, args.sizes, args.rounds, rng))
+    app.extensions["cinebook"].stop()
+
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':<{width}}  {'median us':>12}  {'best us':>12}")
+    for name, r in results.items():
+        print(f"{name:<{width}}  {r['median_us']:>12.3f}  {r['best_us']:>12.3f}")
+
+    if args.json:
+        write_report(args.json, args, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Throughput of serve.py as the number of worker processes grows.
+
+    python bench/bench_workers.py --workers 1 2 4 8 --json workers.json
+
+Seeds one database with --bookings bookings (kept in --data-dir), then for
+every worker count starts serve.py on a fresh copy of it and replays the
+loadtest.py traffic mix over HTTP from --clients client processes. Reports
+requests per second, latency percentiles, the speedup over the first
+worker count and any seat sold twice across workers.
+
+Before the load, --logins concurrent POST /login requests check that
+session writes never wait on the connection pool they share with the
+request; any that do not complete in time fail the run.
+
+Scaling needs cores: with fewer CPUs than workers plus client processes
+the run measures contention, not parallelism. Record the machine's CPU
+count (it is in the report metadata) next to any numbers you quote.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from benchlib import ROOT, latency_summary, write_report
+from loadtest import EXPECTED_STATUSES, HOT_SHOWS, HttpDriver, count_double_booked, run_load, seed, synthetic_ops
+
+READY_TIMEOUT_SECONDS = 30
+LOGIN_TIMEOUT_SECONDS = 10
+
+
+# HttpDriver pointed at a server running in another process
+class ServerDriver(HttpDriver):
+    def __init__(self, port):
+        self.port = port
+
+    def close(self):
+        pass
+
+
+def prepare(args):
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = os.path.join(args.data_dir, f"workers-{args.bookings}-{args.seed}.db")
+    sys.path.insert(0, ROOT)
+    import app as cinebook
+
+    app = cinebook.create_app({"DATABASE": path})
+    seed(cinebook, app, args.bookings, random.Random(args.seed))
+    with app.extensions["db_pool"].connection() as conn:
+        shows = conn.execute(
+            "SELECT movie_id, date, time FROM shows WHERE starts_at > ? ORDER BY id LIMIT ?",
+            (cinebook.schedule.now_text(), HOT_SHOWS),
+        ).fetchall()
+        booking_ids = [row[0] for row in conn.execute(
+            "SELECT id FROM bookings ORDER BY RANDOM() LIMIT 10000"
+        )] or [1]
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    app.extensions["cinebook"].stop()
+    app.extensions["db_pool"].close()
+    return path, shows, booking_ids
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, server):
+    deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("serve.py exited during startup")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/api/movies")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("serve.py did not start in time")
+
+
+# Fire count logins at once; returns how many got a redirect in time
+def check_logins(port, count):
+    completed = []
+    barrier = threading.Barrier(count)
+
+    def login():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=LOGIN_TIMEOUT_SECONDS)
+        barrier.wait()
+        try:
+            conn.request(
+                "POST", "/login", json.dumps({"username": "admin", "password": "admin123"}),
+                {"Content-Type": "application/json"},
+            )
+            response = conn.getresponse()
+            if response.status == 200 and "redirect" in json.loads(response.read()):
+                completed.append(1)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=login) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(completed)
+
+
+def client_process(port, ops, threads, duration):
+    return run_load(ServerDriver(port), ops, threads, duration)
+
+
+def run_workers(workers, args, db_path, ops):
+    run_db = os.path.join(args.data_dir, f"workers-run-{workers}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(run_db + suffix):
+            os.remove(run_db + suffix)
+    shutil.copy(db_path, run_db)
+
+    port = free_port()
+    command = [sys.executable, os.path.join(ROOT, "serve.py"), "--workers", str(workers),
+               "--port", str(port)]
+    if args.pool_size:
+        command += ["--pool-size", str(args.pool_size)]
+    server = subprocess.Popen(
+        command,
+        env={**os.environ, "CINEBOOK_DB": run_db},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(port, server)
+        logins = check_logins(port, args.logins)
+        # Warm every worker's catalog and seat index before measuring
+        warm = ServerDriver(port)
+        for kind, method, path, body in ops[: workers * 20]:
+            if method == "GET":
+                warm.send(method, path, body)
+
+        slices = [ops[i :: args.clients] for i in range(args.clients)]
+        with multiprocessing.Pool(args.clients) as clients:
+            start = time.perf_counter()
+            parts = clients.starmap(
+                client_process, [(port, part, args.threads, args.duration) for part in slices]
+            )
+            elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies, statuses, errors, booked = defaultdict(list), defaultdict(Counter), Counter(), set()
+    for part_latencies, part_statuses, part_errors, part_booked, _elapsed in parts:
+        for kind, values in part_latencies.items():
+            latencies[kind].extend(values)
+        for kind, counts in part_statuses.items():
+            statuses[kind].update(counts)
+        errors.update(part_errors)
+        booked |= part_booked
+
+    conn = sqlite3.connect(run_db)
+    double_booked = count_double_booked(conn, booked)
+    conn.close()
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "workers": workers,
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(total / elapsed, 1) if elapsed else None,
+        "errors": sum(errors.values()),
+        "unexpected_statuses": {
+            kind: {str(k): v for k, v in counts.items() if k not in EXPECTED_STATUSES}
+            for kind, counts in statuses.items()
+            if any(k not in EXPECTED_STATUSES for k in counts)
+        },
+        "double_booked_seats": double_booked,
+        "logins": {"sent": args.logins, "completed": logins},
+        "overall": latency_summary([v for values in latencies.values() for v in values]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=2, help="client processes")
+    parser.add_argument("--threads", type=int, default=8, help="threads per client process")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--logins", type=int, default=64, help="concurrent logins to check")
+    parser.add_argument("--pool-size", type=int,
+                        help="database connections per worker (default: serve.py's)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--data-dir", default=os.path.join(ROOT, "bench", "data"),
+        help="where seeded databases are kept between runs",
+    )
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    db_path, shows, booking_ids = prepare(args)
+    ops = synthetic_ops(args.requests, shows, booking_ids, random.Random(args.seed))
+
+    results = {}
+    baseline = None
+    print(
+        f"{'workers':>8}{'req/s':>10}{'speedup':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}"
+        f"{'double':>8}{'logins':>11}"
+    )
+    for workers in args.workers:
+        result = run_workers(workers, args, db_path, ops)
+        baseline = baseline or result["throughput_per_s"]
+        result["speedup"] = round(result["throughput_per_s"] / baseline, 2)
+        results[f"{workers}_workers"] = result
+        o = result["overall"]
+        print(
+            f"{workers:>8}{result['throughput_per_s']:>10}{result['speedup']:>9}"
+            f"{o['p50_ms']:>9.2f}{o['p99_ms']:>9.2f}{result['errors']:>8}"
+            f"{result['double_booked_seats']:>8}"
+            f"{result['logins']['completed']:>6}/{args.logins:<4}"
+        )
+
+    if args.json:
+        write_report(args.json, args, results)
+    if any(
+        r["errors"] or r["double_booked_seats"] or r["logins"]["completed"] < args.logins
+        for r in results.values()
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare two benchmark reports written with --json.
+
+    python bench/compare.py before.json after.json [--threshold 10]
+
+Prints every metric the two runs share with its relative change, and exits
+1 if a latency (``*_ms``) got worse, or a throughput (``*_per_s``) got
+lower, by more than the threshold percentage.
+"""
+
+import argparse
+import json
+import sys
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for name, value in results.items():
+        key = f"{prefix}{name}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[key] = value
+    return flat
+
+
+def regression(metric, before, after, threshold):
+    if not before:
+        return False
+    change = (after - before) / before * 100
+    if metric.endswith("_ms"):
+        return change > threshold
+    if metric.endswith("_per_s"):
+        return change < -threshold
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+
+    reports = []
+    for path in (args.before, args.after):
+        with open(path) as f:
+            reports.append(json.load(f))
+    before, after = (flatten(r["results"]) for r in reports)
+    print(f"before: {reports[0]['meta'].get('revision')}  after: {reports[1]['meta'].get('revision')}")
+
+    regressions = []
+    width = max((len(k) for k in before.keys() & after.keys()), default=10)
+    for metric in sorted(before.keys() & after.keys()):
+        old, new = before[metric], after[metric]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "-"
+        flag = ""
+        if regression(metric, old, new, args.threshold):
+            regressions.append(metric)
+            flag = "  REGRESSION"
+        print(f"{metric:<{width}}  {old:>12.3f}  {new:>12.3f}  {change:>8}{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
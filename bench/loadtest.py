@@ -0,0 +1,417 @@
+"""Replay a traffic mix against the booking API and report latency.
+
+Each database size runs in its own process against a seeded copy of the
+schema (kept in --data-dir and reused on later runs):
+
+    python bench/loadtest.py --bookings 10000 100000 1000000 --json load.json
+    python bench/loadtest.py --driver http --threads 16 --duration 30
+
+The synthetic mix browses /api/movies, opens seat maps, books, cancels and
+pages through /api/bookings. --replay plays a recorded NDJSON file instead,
+one {"method", "path", "json"} object per line. After the run every show
+that was booked is checked for seats sold twice.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from benchlib import ROOT, latency_summary, write_report
+
+# Operation weights of the synthetic traffic mix
+MIX = {
+    "browse": 40,
+    "seat_map": 25,
+    "book": 20,
+    "cancel": 5,
+    "admin_bookings": 10,
+}
+# Statuses the API returns by design under contention
+EXPECTED_STATUSES = {200, 304, 404, 409, 410}
+BOOKINGS_PER_SHOW = 10
+SEED_BATCH = 50000
+HOT_SHOWS = 50
+SORTS = ["", "price", "title", "-price,title", "duration"]
+GENRES = ["", "action", "drama", "sci-fi"]
+QUERIES = ["", "", "", "in", "dark", "inter"]
+
+
+# ------------------ Seeding ------------------
+
+
+# Fill the app's database with enough future shows to hold n bookings and
+# n bookings spread across them, as if sold through the API
+def seed(cinebook, app, n, rng):
+    from db import show_key, transaction
+
+    with app.extensions["db_pool"].connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*) FROM bookings")
+        if c.fetchone()[0] >= n:
+            return False
+
+        c.execute("SELECT id, title, price FROM movies")
+        movies = {row[0]: row[1:] for row in c.fetchall()}
+        shows_needed = max(n // BOOKINGS_PER_SHOW, HOT_SHOWS)
+        per_day = len(movies) * len(cinebook.schedule.DEFAULT_SHOWTIMES)
+        days = shows_needed // per_day + 2
+        dates = cinebook.schedule.upcoming_dates(days)[1:]
+
+        with transaction(conn) as c:
+            rows, _errors = cinebook.schedule.validate_schedule(
+                cinebook.schedule.generate_schedule(
+                    list(movies), cinebook.DEFAULT_SCREEN_ID, dates
+                ),
+                set(movies),
+                cinebook.LayoutStore().capacities(c),
+            )
+            cinebook.schedule.insert_shows(c, rows)
+            c.execute("SELECT movie_id, date, time, capacity FROM shows WHERE starts_at > ?",
+                      (cinebook.schedule.now_text(),))
+            shows = c.fetchall()
+
+            c.execute("SELECT COALESCE(MAX(id), 0) FROM bookings")
+            first_id = c.fetchone()[0] + 1
+            free = {}
+            for start in range(0, n, SEED_BATCH):
+                bookings, seat_rows = [], []
+                for i in range(start, min(start + SEED_BATCH, n)):
+                    movie_id, date, time_, capacity = shows[i % len(shows)]
+                    if i < len(shows):
+                        # A shuffled seat list per show, handed out in order
+                        free[i] = rng.sample(range(1, capacity + 1), capacity)
+                    seats = free[i % len(shows)][-rng.randint(1, 4):]
+                    del free[i % len(shows)][-len(seats):]
+                    booking_id = first_id + i
+                    customer = rng.randrange(n // 5 + 1)
+                    title, price = movies[movie_id]
+                    bookings.append(
+                        (
+                            booking_id, movie_id, title, date, time_,
+                            ",".join(map(str, seats)), f"Customer {customer}",
+                            f"user{customer}@example.com", f"9{customer:09d}",
+                            len(seats) * price, "Confirmed", customer,
+                        )
+                    )
+                    key = show_key(movie_id, date, time_)
+                    seat_rows.extend((booking_id, key, seat) for seat in seats)
+                c.executemany(
+                    """
+                    INSERT INTO bookings (id, movie_id, movie_title, date, time, seats, name,
+                                          email, phone, total, status, user_id)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                    bookings,
+                )
+                c.executemany(
+                    "INSERT INTO booking_seats (booking_id, show_key, seat_no) VALUES (?, ?, ?)",
+                    seat_rows,
+                )
+            c.execute(
+                """
+                UPDATE shows SET seats_sold = (
+                    SELECT COUNT(*) FROM booking_seats
+                    WHERE booking_seats.show_key = show_key(shows.movie_id, shows.date, shows.time)
+                )
+            """
+            )
+            cinebook.analytics.rebuild(c)
+    return True
+
+
+# ------------------ Traffic ------------------
+
+
+def synthetic_ops(count, shows, booking_ids, rng):
+    hot = shows[:HOT_SHOWS]
+    names, weights = zip(*MIX.items())
+    ops = []
+    for _ in range(count):
+        kind = rng.choices(names, weights)[0]
+        if kind == "browse":
+            params = {"sort_by": rng.choice(SORTS), "genre": rng.choice(GENRES),
+                      "q": rng.choice(QUERIES)}
+            query = "&".join(f"{k}={v}" for k, v in params.items() if v)
+            ops.append((kind, "GET", f"/api/movies?{query}", None))
+        elif kind == "seat_map":
+            movie_id, date, time_ = rng.choice(hot)
+            ops.append((kind, "GET", f"/api/shows/{movie_id}/{date}/{time_.replace(' ', '%20')}/seats", None))
+        elif kind == "book":
+            movie_id, date, time_ = rng.choice(hot)
+            body = {"movie_id": movie_id, "date": date, "time": time_,
+                    "seats": rng.sample(range(1, 51), rng.randint(1, 4)),
+                    "name": "load", "email": "load@example.com", "phone": "0"}
+            ops.append((kind, "POST", "/api/book", body))
+        elif kind == "cancel":
+            ops.append((kind, "DELETE", f"/api/cancel_booking/{rng.choice(booking_ids)}", None))
+        else:
+            if rng.random() < 0.5:
+                path = f"/api/bookings?after_id={rng.choice(booking_ids)}&limit=50"
+            else:
+                path = f"/api/bookings?search=user{rng.randrange(1000)}&limit=50"
+            ops.append((kind, "GET", path, None))
+    return ops
+
+
+def replay_ops(path, count):
+    ops = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                r = json.loads(line)
+                name = r.get("name") or r["path"].split("?")[0]
+                ops.append((name, r.get("method", "GET"), r["path"], r.get("json")))
+    if count:
+        ops = (ops * (count // max(len(ops), 1) + 1))[:count]
+    return ops
+
+
+# ------------------ Drivers ------------------
+
+
+class ClientDriver:
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def send(self, method, path, body):
+        if not hasattr(self.local, "client"):
+            self.local.client = self.app.test_client()
+        response = self.local.client.open(path, method=method, json=body)
+        data = response.get_data()
+        return response.status_code, data
+
+    def close(self):
+        pass
+
+
+class HttpDriver:
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+
+        self.server = make_server("127.0.0.1", 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def send(self, method, path, body):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        conn.request(method, path, payload, headers)
+        response = conn.getresponse()
+        data = response.read()
+        conn.close()
+        return response.status, data
+
+    def close(self):
+        self.server.shutdown()
+
+
+# ------------------ Run ------------------
+
+
+def run_load(driver, ops, threads, duration):
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    errors = Counter()
+    booked_shows = set()
+    lock = threading.Lock()
+    position = iter(range(len(ops)))
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker():
+        while True:
+            with lock:
+                i = next(position, None)
+            if i is None or (deadline and time.perf_counter() > deadline):
+                return
+            kind, method, path, body = ops[i]
+            start = time.perf_counter()
+            try:
+                status, _data = driver.send(method, path, body)
+            except Exception as e:  # noqa: BLE001 - count transport failures
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies[kind].append(elapsed)
+                statuses[kind][status] += 1
+                if status not in EXPECTED_STATUSES:
+                    errors[kind] += 1
+                if kind == "book" and status == 200:
+                    booked_shows.add((body["movie_id"], body["date"], body["time"]))
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return latencies, statuses, errors, booked_shows, elapsed
+
+
+# Seats that more than one active booking claims, for the given shows
+def count_double_booked(conn, shows):
+    double = 0
+    for key in shows:
+        seats = Counter()
+        for (value,) in conn.execute(
+            """
+            SELECT seats FROM bookings
+            WHERE movie_id=? AND date=? AND time=? AND status != 'Cancelled'
+        """,
+            key,
+        ):
+            seats.update(s for s in value.split(",") if s.strip())
+        double += sum(1 for n in seats.values() if n > 1)
+    return double
+
+
+def run_one(args):
+    os.makedirs(args.data_dir, exist_ok=True)
+    sys.path.insert(0, ROOT)
+    import app as cinebook
+
+    app = cinebook.create_app(
+        {"DATABASE": os.path.join(args.data_dir, f"load-{args.bookings}-{args.seed}.db")}
+    )
+    pool = app.extensions["db_pool"]
+
+    rng = random.Random(args.seed)
+    seed_start = time.perf_counter()
+    seeded = seed(cinebook, app, args.bookings, rng)
+    seed_seconds = time.perf_counter() - seed_start
+
+    with pool.connection() as conn:
+        shows = conn.execute(
+            "SELECT movie_id, date, time FROM shows WHERE starts_at > ? ORDER BY id LIMIT ?",
+            (cinebook.schedule.now_text(), HOT_SHOWS),
+        ).fetchall()
+        booking_ids = [
+            row[0]
+            for row in conn.execute(
+                "SELECT id FROM bookings ORDER BY RANDOM() LIMIT 10000"
+            )
+        ] or [1]
+
+    if args.replay:
+        ops = replay_ops(args.replay, args.requests)
+    else:
+        ops = synthetic_ops(args.requests, shows, booking_ids, rng)
+
+    driver = (HttpDriver if args.driver == "http" else ClientDriver)(app)
+    # Warm the catalog cache and seat index outside the measured run
+    warm_start = time.perf_counter()
+    driver.send("GET", "/api/movies", None)
+    movie_id, date, time_ = shows[0]
+    driver.send("GET", f"/api/shows/{movie_id}/{date}/{time_.replace(' ', '%20')}/seats", None)
+    warm_seconds = time.perf_counter() - warm_start
+
+    latencies, statuses, errors, booked, elapsed = run_load(
+        driver, ops, args.threads, args.duration
+    )
+    driver.close()
+    app.extensions["cinebook"].stop()
+
+    with pool.connection() as conn:
+        double_booked = count_double_booked(conn, booked)
+
+    total = sum(len(v) for v in latencies.values())
+    all_latencies = [v for values in latencies.values() for v in values]
+    return {
+        "bookings": args.bookings,
+        "driver": args.driver,
+        "threads": args.threads,
+        "seeded": seeded,
+        "seed_s": round(seed_seconds, 2),
+        "warmup_s": round(warm_seconds, 3),
+        "elapsed_s": round(elapsed, 3),
+        "requests": total,
+        "throughput_per_s": round(total / elapsed, 1) if elapsed else None,
+        "errors": sum(errors.values()),
+        "double_booked_seats": double_booked,
+        "overall": latency_summary(all_latencies),
+        "endpoints": {
+            kind: {
+                **latency_summary(values),
+                "errors": errors[kind],
+                "statuses": {str(k): v for k, v in sorted(statuses[kind].items(), key=str)},
+            }
+            for kind, values in sorted(latencies.items())
+        },
+    }
+
+
+def print_result(result):
+    print(
+        f"\n{result['bookings']} bookings, {result['driver']} driver, "
+        f"{result['threads']} threads: {result['requests']} requests in "
+        f"{result['elapsed_s']}s ({result['throughput_per_s']} req/s)"
+    )
+    print(f"  errors: {result['errors']}  double-booked seats: {result['double_booked_seats']}")
+    print(f"  {'endpoint':<16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses")
+    rows = list(result["endpoints"].items()) + [("overall", result["overall"])]
+    for kind, s in rows:
+        print(
+            f"  {kind:<16}{s['count']:>8}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}"
+            f"{s['p99_ms']:>10.2f}  {s.get('statuses', '')}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, nargs="+", default=[10000])
+    parser.add_argument("--driver", choices=["client", "http"], default="client")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--duration", type=float, help="stop after this many seconds")
+    parser.add_argument("--replay", help="NDJSON file of recorded requests")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--data-dir", default=os.path.join(ROOT, "bench", "data"),
+        help="where seeded databases are kept between runs",
+    )
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--one", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one:
+        args.bookings = args.bookings[0]
+        print(json.dumps(run_one(args)))
+        return
+
+    # One process per database size, so every run starts with cold caches
+    results = {}
+    for n in args.bookings:
+        cmd = [sys.executable, os.path.abspath(__file__), "--one",
+               "--bookings", str(n), "--driver", args.driver,
+               "--threads", str(args.threads), "--requests", str(args.requests),
+               "--seed", str(args.seed), "--data-dir", args.data_dir]
+        if args.duration:
+            cmd += ["--duration", str(args.duration)]
+        if args.replay:
+            cmd += ["--replay", args.replay]
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results[f"{n}_bookings"] = result
+        print_result(result)
+
+    if args.json:
+        write_report(args.json, args, results)
+    if any(r["errors"] or r["double_booked_seats"] for r in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
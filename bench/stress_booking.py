@@ -0,0 +1,106 @@
+"""Fire many overlapping /api/book calls from worker threads and check that
+no seat was sold twice.
+
+    python bench/stress_booking.py --requests 5000 --threads 32
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--shows", type=int, default=3)
+    parser.add_argument("--max-seats", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import app as cinebook
+
+    # A throwaway database, deleted when the pool closes
+    app = cinebook.create_app({"DATABASE": ":memory:"})
+
+    rng = random.Random(args.seed)
+    shows = [(1, "2030-01-01", f"{i % 12 + 1:02d}:00 AM") for i in range(args.shows)]
+    with app.app_context():
+        conn = cinebook.get_db()
+        capacity = cinebook.layout_store.get(
+            conn.cursor(), cinebook.DEFAULT_SCREEN_ID
+        ).capacity
+        with cinebook.transaction(conn) as c:
+            rows, _errors = cinebook.schedule.validate_schedule(
+                [
+                    {"movie_id": m, "screen_id": cinebook.DEFAULT_SCREEN_ID, "date": d, "time": t}
+                    for m, d, t in shows
+                ],
+                {1},
+                cinebook.layout_store.capacities(c),
+            )
+            cinebook.schedule.insert_shows(c, rows)
+
+    payloads = []
+    for _ in range(args.requests):
+        movie_id, date, show_time = rng.choice(shows)
+        count = rng.randint(1, args.max_seats)
+        payloads.append(
+            {
+                "movie_id": movie_id,
+                "date": date,
+                "time": show_time,
+                "seats": rng.sample(range(1, capacity + 1), count),
+                "name": "stress",
+                "email": "stress@example.com",
+                "phone": "0",
+            }
+        )
+
+    local = threading.local()
+    statuses = Counter()
+    statuses_lock = threading.Lock()
+
+    def book(payload):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        status = local.client.post("/api/book", json=payload).status_code
+        with statuses_lock:
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(book, payloads))
+    elapsed = time.perf_counter() - start
+    app.extensions["cinebook"].stop()
+
+    pool = app.extensions["db_pool"]
+    sold = Counter()
+    with pool.connection() as conn:
+        for movie_id, date, show_time, seats in conn.execute(
+            "SELECT movie_id, date, time, seats FROM bookings WHERE status != 'Cancelled'"
+        ):
+            for seat in seats.split(","):
+                sold[(movie_id, date, show_time, int(seat))] += 1
+    pool.close()
+    double_sold = sum(1 for n in sold.values() if n > 1)
+
+    print(f"requests:      {args.requests} on {args.threads} threads")
+    print(f"elapsed:       {elapsed:.2f}s ({args.requests / elapsed:.0f} req/s)")
+    print(f"statuses:      {dict(sorted(statuses.items()))}")
+    print(f"seats sold:    {len(sold)} / {len(shows) * capacity}")
+    print(f"double-sold:   {double_sold}")
+    if double_sold or set(statuses) - {200, 409}:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
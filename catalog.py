@@ -0,0 +1,287 @@
+import bisect
+import hashlib
+import json
+import re
+import threading
+
+SORT_FIELDS = ("price", "title", "duration", "id", "genre")
+MIN_TRIGRAM_QUERY = 3
+# Upper bound on memoized listings/responses per catalog version
+MAX_CACHED_VARIANTS = 256
+
+_DURATION_RE = re.compile(
+    r"^\s*(?:(\d+)\s*h(?:r|rs|our|ours)?)?\s*(?:(\d+)\s*m(?:in|ins|inute|inutes)?)?\s*$",
+    re.IGNORECASE,
+)
+
+
+# "148 min", "2hr 33min", "2 hr", "95" -> minutes; None if unrecognised
+def parse_duration(text):
+    if text is None:
+        return None
+    text = str(text).strip()
+    if text.isdigit():
+        return int(text)
+    match = _DURATION_RE.match(text)
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes = match.groups()
+    return int(hours or 0) * 60 + int(minutes or 0)
+
+
+# A number to sort by, or None (sorted last). SQLite keeps whatever type a
+# row was written with, so one text price must not break every sort.
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value):
+    return "" if value is None else str(value)
+
+
+# Typed sort keys; duration sorts by parsed minutes, title ignores case
+_SORT_VALUES = {
+    "price": lambda m: _number(m["price"]),
+    "title": lambda m: _text(m["title"]).casefold(),
+    "duration": lambda m: _number(m["duration_minutes"]),
+    "id": lambda m: _number(m["id"]),
+    "genre": lambda m: _text(m["genre"]).casefold(),
+}
+
+
+# "price,-title" -> (("price", False), ("title", True)); unknown fields are
+# ignored. A single field can also be reversed with order=desc.
+def parse_sort(sort_by, order=""):
+    spec = []
+    for part in (sort_by or "").split(","):
+        part = part.strip()
+        descending = part.startswith("-")
+        field = part.lstrip("-")
+        if field in SORT_FIELDS:
+            spec.append((field, descending))
+    if len(spec) == 1 and order.lower() == "desc":
+        spec = [(spec[0][0], True)]
+    return tuple(spec)
+
+
+# Stable multi-key sort: sort by the least significant key first. Missing
+# values always sort last.
+def sort_movies(movies, spec):
+    result = list(movies)
+    for field, descending in reversed(spec):
+        value = _SORT_VALUES[field]
+        if descending:
+            result.sort(key=lambda m: ((v := value(m)) is not None, v), reverse=True)
+        else:
+            result.sort(key=lambda m: ((v := value(m)) is None, v))
+    return result
+
+
+# Whole-number price from JSON or CSV (12, 12.0, "12"), or None. Booleans
+# and fractions are rejected rather than truncated.
+def parse_price(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else None
+
+
+# Check movies for a bulk load; returns (rows, errors, skipped) where errors
+# are {"index", "error"}. Titles already in the catalog (ignoring case) or
+# repeated in the upload are skipped and counted, not failed.
+def validate_movies(items, existing_titles):
+    rows, errors, skipped = [], [], 0
+    seen = {t.casefold() for t in existing_titles if t}
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": i, "error": "Movie must be an object"})
+            continue
+        title = str(item.get("title") or "").strip()
+        genre = str(item.get("genre") or "").strip()
+        duration = str(item.get("duration") or "").strip()
+        if not title or not genre or not duration or item.get("price") in (None, ""):
+            errors.append({"index": i, "error": "All fields are required"})
+            continue
+        minutes = parse_duration(duration)
+        if minutes is None:
+            errors.append({"index": i, "error": "Duration must look like '148 min' or '2h 28m'"})
+            continue
+        price = parse_price(item["price"])
+        if price is None or price < 0:
+            errors.append({"index": i, "error": "Price must be a whole number"})
+            continue
+        if title.casefold() in seen:
+            skipped += 1
+            continue
+        seen.add(title.casefold())
+        rows.append((title, genre, duration, price, minutes))
+    return rows, errors, skipped
+
+
+def insert_movies(c, rows):
+    c.executemany(
+        "INSERT INTO movies (title, genre, duration, price, duration_minutes) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+
+
+def _trigrams(text):
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+# Snapshot of the movies table with the lookups /api/movies needs prebuilt
+class _CatalogData:
+    def __init__(self, movies):
+        self.by_id = {m["id"]: m for m in movies}
+        self.all = sorted(movies, key=lambda m: m["id"])
+        self.by_genre = {}
+        for m in self.all:
+            self.by_genre.setdefault(_text(m["genre"]).lower(), []).append(m)
+        self.sorted = {
+            field: sort_movies(self.all, ((field, False),)) for field in SORT_FIELDS
+        }
+
+        # Title search: sorted title words for short prefix queries, trigrams
+        # for substring queries
+        self.titles = {m["id"]: _text(m["title"]).lower() for m in self.all}
+        self.words = sorted(
+            (word, m_id)
+            for m_id, title in self.titles.items()
+            for word in set(title.split())
+        )
+        self.trigrams = {}
+        for m_id, title in self.titles.items():
+            for gram in _trigrams(title):
+                self.trigrams.setdefault(gram, set()).add(m_id)
+
+        self.digest = hashlib.sha1(
+            json.dumps(self.all, sort_keys=True).encode()
+        ).hexdigest()[:16]
+        # Listings and serialized responses, filled on first use
+        self.listings = {}
+        self.payloads = {}
+
+    # Ids of movies whose title contains q; queries shorter than a trigram
+    # match the start of a title word instead
+    def search(self, q):
+        if len(q) < MIN_TRIGRAM_QUERY:
+            start = bisect.bisect_left(self.words, (q,))
+            ids = set()
+            for word, m_id in self.words[start:]:
+                if not word.startswith(q):
+                    break
+                ids.add(m_id)
+            return ids
+
+        candidates = None
+        for gram in _trigrams(q):
+            matches = self.trigrams.get(gram)
+            if not matches:
+                return set()
+            candidates = matches if candidates is None else candidates & matches
+        return {m_id for m_id in candidates if q in self.titles[m_id]}
+
+    def listing(self, genre="", sort=(), q=""):
+        if q:
+            ids = self.search(q)
+            movies = [self.by_id[m_id] for m_id in sorted(ids)]
+            if genre:
+                movies = [m for m in movies if _text(m["genre"]).lower() == genre]
+            return sort_movies(movies, sort)
+
+        key = (genre, sort)
+        movies = self.listings.get(key)
+        if movies is None:
+            if not genre and len(sort) == 1 and not sort[0][1]:
+                movies = self.sorted[sort[0][0]]
+            else:
+                base = self.by_genre.get(genre, []) if genre else self.all
+                movies = sort_movies(base, sort)
+            if len(self.listings) < MAX_CACHED_VARIANTS:
+                self.listings[key] = movies
+        return movies
+
+
+# In-process movie catalog cache. Anything that writes to the movies table
+# (add, edit or delete) must call invalidate() afterwards.
+class MovieCatalog:
+    def __init__(self):
+        self._data = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def load(self, conn):
+        with self._lock:
+            generation = self._generation
+        c = conn.cursor()
+        c.execute("SELECT id, title, genre, duration, price, duration_minutes FROM movies")
+        movies = [
+            {
+                "id": row[0],
+                "title": row[1],
+                "genre": row[2],
+                "duration": row[3],
+                "price": row[4],
+                "duration_minutes": row[5],
+            }
+            for row in c.fetchall()
+        ]
+        data = _CatalogData(movies)
+        with self._lock:
+            # Drop the snapshot if the catalog was invalidated while loading
+            if generation == self._generation:
+                self._data = data
+        return data
+
+    def _current(self, conn):
+        return self._data or self.load(conn)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._data = None
+
+    def get(self, conn, movie_id):
+        return self._current(conn).by_id.get(movie_id)
+
+    def movies(self, conn, genre="", sort=(), q=""):
+        return self._current(conn).listing(genre, sort, q)
+
+    def etag(self, conn, *query):
+        data = self._current(conn)
+        variant = f"{data.digest}|{query!r}"
+        return hashlib.sha1(variant.encode()).hexdigest()[:20]
+
+    # JSON body for a page of a listing. Listings without a search term are
+    # serialized once per catalog version.
+    def payload(self, conn, genre="", sort=(), q="", limit=None, offset=0):
+        data = self._current(conn)
+        key = (genre, sort, limit, offset)
+        body = None if q else data.payloads.get(key)
+        if body is None:
+            movies = data.listing(genre, sort, q)
+            end = None if limit is None else offset + limit
+            body = json.dumps(movies[offset:end]).encode()
+            if not q and len(data.payloads) < MAX_CACHED_VARIANTS:
+                data.payloads[key] = body
+        return body
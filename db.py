@@ -0,0 +1,146 @@
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from flask import current_app, g
+
+POOL_SIZE = 16
+BUSY_TIMEOUT_SECONDS = 30
+CACHED_STATEMENTS = 256
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+# Bounded pool of SQLite connections; each worker thread checks one out
+# for the length of a request and hands it back afterwards.
+# path ":memory:" gives the pool its own throwaway database (for tests). It
+# lives in a temporary file, deleted by close() or at exit: a shared-cache
+# in-memory database takes table locks that busy_timeout does not wait on,
+# so concurrent requests would fail where a file database makes them wait.
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE, factory=sqlite3.Connection):
+        self._cleanup = None
+        if path == ":memory:":
+            fd, path = tempfile.mkstemp(prefix="cinebook-", suffix=".db")
+            os.close(fd)
+            self._cleanup = weakref.finalize(self, _remove_database, path)
+        self.path = path
+        self.size = size
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        # Autocommit mode: transactions are opened explicitly with BEGIN
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+            factory=self.factory,
+            uri=self.path.startswith("file:"),
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        if self._cleanup:
+            self._cleanup()
+
+
+def _remove_database(path):
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+# String form of a (movie_id, date, time) show, used as booking_seats.show_key
+def show_key(movie_id, date, time):
+    return f"{movie_id}|{date}|{time}"
+
+
+@contextmanager
+def transaction(conn, mode="IMMEDIATE"):
+    conn.execute(f"BEGIN {mode}")
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+# ------------------ Flask Integration ------------------
+
+
+def get_pool():
+    return current_app.extensions["db_pool"]
+
+
+# One pooled connection per request, returned when the app context ends.
+# g.db_wait is how long the request waited for it.
+def get_db():
+    if "db" not in g:
+        start = time.perf_counter()
+        g.db = get_pool().acquire()
+        g.db_wait = time.perf_counter() - start
+    return g.db
+
+
+def close_db(exc=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+def init_app(app, path, size=POOL_SIZE, factory=sqlite3.Connection):
+    pool = ConnectionPool(path, size, factory)
+    app.extensions["db_pool"] = pool
+    app.teardown_appcontext(close_db)
+    return pool
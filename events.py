@@ -0,0 +1,177 @@
+"""In-process pub/sub for seat map changes, streamed to browsers as
+Server-Sent Events.
+
+Each show that is being watched has a channel holding its recent events and
+a condition variable. Publishing appends one event and wakes the waiting
+listeners, so its cost does not grow with per-subscriber queues. Event ids
+come from one process-wide counter, prefixed with a per-broker epoch so an
+id from another process (or an earlier run) is never mistaken for one of
+ours. A client that reconnects with Last-Event-ID gets the events it
+missed, or a "reset" event when they are no longer kept.
+
+A seat map snapshot carries the current event id (``cursor()``), which also
+opens the show's channel, so a stream opened right after it replays
+whatever happened in between.
+"""
+
+import collections
+import itertools
+import json
+import threading
+import time
+import uuid
+
+EVENT_HISTORY = 256
+KEEPALIVE_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+# Channels without listeners are kept this long after their last use, so a
+# snapshot and the stream opened after it see the same history
+CHANNEL_IDLE_SECONDS = 60
+
+
+class _Channel:
+    def __init__(self, lock, since):
+        self.events = collections.deque(maxlen=EVENT_HISTORY)
+        self.changed = threading.Condition(lock)
+        self.listeners = 0
+        self.used_at = time.monotonic()
+        # Every event for this show with an id above this one is in events
+        self.complete_after = since
+
+    def append(self, event):
+        if len(self.events) == self.events.maxlen:
+            self.complete_after = self.events[0][0]
+        self.events.append(event)
+
+    def idle(self, now):
+        return self.listeners == 0 and now - self.used_at > CHANNEL_IDLE_SECONDS
+
+
+# One open stream, returned by EventBroker.listen(). Counts as a listener
+# from the moment it is created until close(), whether or not it was read.
+class Listener:
+    def __init__(self, broker, key, channel, cursor, keepalive):
+        self._broker = broker
+        self._key = key
+        self._channel = channel
+        # None: the client's last event is gone and it must start over
+        self._cursor = cursor
+        self._keepalive = keepalive
+        self._pending = collections.deque()
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    # (id, kind, seats) for the next event; None when nothing happened for
+    # keepalive seconds
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        broker, channel = self._broker, self._channel
+        if self._cursor is None:
+            with broker._lock:
+                self._cursor = broker._last_id
+            return (broker.event_id(self._cursor), "reset", [])
+        if not self._pending:
+            with broker._lock:
+                self._pending.extend(e for e in channel.events if e[0] > self._cursor)
+                if not self._pending:
+                    channel.changed.wait(self._keepalive)
+                    self._pending.extend(e for e in channel.events if e[0] > self._cursor)
+            if not self._pending:
+                return None
+        event_id, kind, seats = self._pending.popleft()
+        self._cursor = event_id
+        return (broker.event_id(event_id), kind, seats)
+
+    def close(self):
+        with self._broker._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._channel.listeners -= 1
+            self._channel.used_at = time.monotonic()
+
+
+class EventBroker:
+    def __init__(self):
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._pruned_at = time.monotonic()
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def event_id(self, number):
+        return f"{self.epoch}-{number}"
+
+    # Our counter value for an id this broker gave out, else None
+    def _parse_id(self, text):
+        epoch, _, number = (text or "").partition("-")
+        if epoch == self.epoch and number.isdigit():
+            return int(number)
+        return None
+
+    def _channel(self, key):
+        now = time.monotonic()
+        if now - self._pruned_at > CHANNEL_IDLE_SECONDS:
+            self._pruned_at = now
+            for k in [k for k, c in self._channels.items() if c.idle(now)]:
+                del self._channels[k]
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = _Channel(self._lock, self._last_id)
+        channel.used_at = now
+        return channel
+
+    def publish(self, key, kind, seats):
+        if not seats:
+            return
+        with self._lock:
+            self._last_id = next(self._ids)
+            channel = self._channels.get(key)
+            # Nobody is watching; reconnecting clients will get a reset
+            if channel is None:
+                return
+            channel.append((self._last_id, kind, sorted(int(s) for s in seats)))
+            channel.changed.notify_all()
+
+    # Id of the latest event, to hand out with a snapshot of key's seats.
+    # Call it before reading the snapshot: replaying an event the snapshot
+    # already shows is harmless, missing one is not.
+    def cursor(self, key):
+        with self._lock:
+            self._channel(key)
+            return self.event_id(self._last_id)
+
+    # Start following key's events after last_event_id (an id from cursor()
+    # or a previous event), or from now when it is None. The listener is
+    # registered before this returns; close it when the stream ends.
+    def listen(self, key, last_event_id=None, keepalive=KEEPALIVE_SECONDS):
+        with self._lock:
+            channel = self._channel(key)
+            channel.listeners += 1
+            cursor = self._last_id
+            if last_event_id is not None:
+                since = self._parse_id(last_event_id)
+                if since is None or not channel.complete_after <= since <= cursor:
+                    cursor = None
+                else:
+                    cursor = since
+        return Listener(self, key, channel, cursor, keepalive)
+
+    def listeners(self, key=None):
+        with self._lock:
+            if key is not None:
+                channel = self._channels.get(key)
+                return channel.listeners if channel else 0
+            return sum(c.listeners for c in self._channels.values())
+
+
+# Server-Sent Events wire format for one listen() item
+def format_sse(item):
+    if item is None:
+        return ": keepalive\n\n"
+    event_id, kind, seats = item
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps({'seats': seats})}\n\n"
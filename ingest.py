@@ -0,0 +1,114 @@
+"""Streaming readers for bulk request bodies.
+
+Bulk endpoints take a JSON array, newline-delimited JSON or CSV. The body is
+read from the WSGI input in fixed-size chunks and items are yielded one at
+a time, so an upload is never held in memory as a whole -- only the
+validated rows the caller keeps.
+"""
+
+import codecs
+import csv
+import io
+import json
+
+READ_SIZE = 64 * 1024
+WHITESPACE = " \t\r\n"
+
+
+class BodyError(ValueError):
+    pass
+
+
+# Items of a top-level JSON array, decoded as the chunks arrive
+def iter_json_array(stream, read_size=READ_SIZE):
+    decode = json.JSONDecoder().raw_decode
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, eof = "", 0, False
+
+    def more():
+        nonlocal buf, pos, eof
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buf = buf[pos:] + text.decode(chunk, final=eof)
+        pos = 0
+
+    # Next non-blank character without consuming it; "" at the end
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buf) or eof:
+                return buf[pos:pos + 1]
+            more()
+
+    if peek() != "[":
+        raise BodyError("Expected a JSON array")
+    pos += 1
+    if peek() == "]":
+        pos += 1
+    else:
+        while True:
+            peek()
+            # An item cut off at the end of the buffer needs the next chunk
+            while True:
+                try:
+                    item, end = decode(buf, pos)
+                    if end < len(buf) or eof:
+                        break
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise BodyError(f"Malformed JSON: {e.msg}")
+                more()
+            pos = end
+            yield item
+            separator = peek()
+            pos += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise BodyError("Expected ',' or ']' between array items")
+    if peek():
+        raise BodyError("Unexpected data after the JSON array")
+
+
+def _text(stream):
+    if not hasattr(stream, "read1"):
+        stream = io.BufferedReader(stream, READ_SIZE)
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+
+# One JSON value per line; blank lines are ignored
+def iter_ndjson(stream):
+    for number, line in enumerate(_text(stream), 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise BodyError(f"Malformed JSON on line {number}: {e.msg}")
+
+
+# Rows of a CSV file with a header line, as dicts keyed by column name
+def iter_csv(stream):
+    reader = csv.DictReader(_text(stream))
+    if not reader.fieldnames:
+        raise BodyError("CSV body needs a header row")
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    try:
+        yield from reader
+    except csv.Error as e:
+        raise BodyError(f"Malformed CSV on line {reader.line_num}: {e}")
+
+
+# Items of a request body in whichever format its Content-Type names
+def iter_request_items(req, allow_csv=False):
+    mimetype = req.mimetype
+    if mimetype == "application/json":
+        return iter_json_array(req.stream)
+    if mimetype in ("application/x-ndjson", "application/jsonl"):
+        return iter_ndjson(req.stream)
+    if allow_csv and mimetype == "text/csv":
+        return iter_csv(req.stream)
+    formats = "a JSON array, NDJSON or CSV" if allow_csv else "a JSON array or NDJSON"
+    raise BodyError(f"Body must be {formats}")
@@ -0,0 +1,298 @@
+"""Auditorium layouts and best-seat allocation.
+
+A layout is a list of row strings, one character per cell:
+
+    S, P, R   a seat of that class (standard, premium, recliner)
+    X         a seat that exists but cannot be sold
+    _         an aisle or gap
+
+Seats are numbered 1..N in row-major order, skipping aisles, so the default
+5 x 10 hall keeps the seat numbers 1-50 that bookings already use.
+"""
+
+import itertools
+import threading
+
+DEFAULT_SCREEN_ID = 1
+AISLE = "_"
+BLOCKED = "X"
+DEFAULT_CLASSES = (
+    ("S", "Standard", 1.0),
+    ("P", "Premium", 1.5),
+    ("R", "Recliner", 2.0),
+)
+# Rows count for more than columns when judging how central a seat is, and
+# the ideal row sits a little behind the middle of the hall
+ROW_WEIGHT = 1.5
+IDEAL_ROW = 0.6
+
+
+def grid_rows(rows, cols, seat_class="S"):
+    return [seat_class * cols] * rows
+
+
+def row_label(index):
+    label = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        label = chr(65 + rem) + label
+    return label
+
+
+# A run of adjacent seats in one row, numbered first..first+length-1
+class _Segment:
+    def __init__(self, row, col0, first, scores):
+        self.row = row
+        self.col0 = col0
+        self.first = first
+        self.length = len(scores)
+        self.mask = (1 << self.length) - 1
+        self.prefix = [0.0]
+        for score in scores:
+            self.prefix.append(self.prefix[-1] + score)
+
+    def window_score(self, start, n):
+        return self.prefix[start + n] - self.prefix[start]
+
+    # Window sums are convex in the start position, so the best window in
+    # [lo, hi] is the one nearest the centred start, clamped to the range
+    def best_start(self, center, n, lo, hi):
+        return min(max(round(center - self.col0 - (n - 1) / 2), lo), hi)
+
+
+class Layout:
+    def __init__(self, screen_id, name, rows, multipliers):
+        self.screen_id = screen_id
+        self.name = name
+        self.rows = list(rows)
+        self.cols = max((len(r) for r in self.rows), default=0)
+        self.multipliers = multipliers
+        self.center = (self.cols - 1) / 2
+        ideal_row = (len(self.rows) - 1) * IDEAL_ROW
+
+        self.seat_class = {}
+        self.labels = {}
+        self.scores = {}
+        self.blocked_mask = 0
+        self.segments = []
+        number = 0
+        for r, row in enumerate(self.rows):
+            in_row = 0
+            segment_scores = []
+            for col, code in enumerate(row + AISLE):
+                if code == AISLE:
+                    if segment_scores:
+                        first = number - len(segment_scores) + 1
+                        col0 = col - len(segment_scores)
+                        self.segments.append(_Segment(r, col0, first, segment_scores))
+                        segment_scores = []
+                    continue
+                number += 1
+                in_row += 1
+                score = (col - self.center) ** 2 + ROW_WEIGHT * (r - ideal_row) ** 2
+                self.scores[number] = score
+                self.seat_class[number] = code
+                self.labels[number] = f"{row_label(r)}{in_row}"
+                segment_scores.append(score)
+                if code == BLOCKED:
+                    self.blocked_mask |= 1 << number
+
+        self.capacity = number
+        self.sellable = number - bin(self.blocked_mask).count("1")
+        self.by_score = sorted(self.scores, key=lambda s: (self.scores[s], s))
+        self._segment_order = {}
+        self._json = None
+        self._lock = threading.Lock()
+
+    def is_sellable(self, seat):
+        return (
+            type(seat) is int
+            and 1 <= seat <= self.capacity
+            and not self.blocked_mask >> seat & 1
+        )
+
+    def price(self, seats, base_price):
+        return round(sum(base_price * self.multipliers.get(self.seat_class[s], 1.0) for s in seats))
+
+    def free_count(self, occupied):
+        return self.sellable - bin(occupied & ~self.blocked_mask).count("1")
+
+    # Segments ordered by the best score any n-seat window in them could
+    # reach, so the search can stop once no remaining segment can win
+    def _segments_for(self, n):
+        order = self._segment_order.get(n)
+        if order is None:
+            order = []
+            for seg in self.segments:
+                if seg.length >= n:
+                    start = seg.best_start(self.center, n, 0, seg.length - n)
+                    order.append((seg.window_score(start, n), seg.first, seg))
+            order.sort(key=lambda item: item[:2])
+            with self._lock:
+                self._segment_order[n] = order
+        return order
+
+    # Best contiguous block of n free seats in one row, or None
+    def best_block(self, occupied, n):
+        taken = occupied | self.blocked_mask
+        best_score, best = None, None
+        for bound, _first, seg in self._segments_for(n):
+            if best_score is not None and bound >= best_score:
+                break
+            free = ~(taken >> seg.first) & seg.mask
+            while free:
+                low = (free & -free).bit_length() - 1
+                shifted = free >> low
+                run = (shifted ^ (shifted + 1)).bit_length() - 1
+                if run >= n:
+                    start = seg.best_start(self.center, n, low, low + run - n)
+                    score = seg.window_score(start, n)
+                    if best_score is None or score < best_score:
+                        best_score, best = score, seg.first + start
+                free &= ~(((1 << run) - 1) << low)
+        if best is None:
+            return None
+        return list(range(best, best + n))
+
+    # Best n seats: a contiguous block if one exists, otherwise the n most
+    # central free seats wherever they are
+    def allocate(self, occupied, n):
+        if n <= 0:
+            return []
+        block = self.best_block(occupied, n)
+        if block is not None:
+            return block
+        taken = occupied | self.blocked_mask
+        free = (s for s in self.by_score if not taken >> s & 1)
+        return sorted(itertools.islice(free, n))
+
+    def to_json(self):
+        if self._json is None:
+            grid = []
+            number = 0
+            for row in self.rows:
+                cells = []
+                for code in row:
+                    if code == AISLE:
+                        cells.append(None)
+                        continue
+                    number += 1
+                    cells.append(
+                        {
+                            "seat": number,
+                            "label": self.labels[number],
+                            "class": code,
+                            "multiplier": self.multipliers.get(code, 1.0),
+                        }
+                    )
+                grid.append(cells)
+            self._json = {
+                "id": self.screen_id,
+                "name": self.name,
+                "rows": len(self.rows),
+                "cols": self.cols,
+                "capacity": self.sellable,
+                "grid": grid,
+            }
+        return self._json
+
+
+# ------------------ Storage ------------------
+
+
+def create_tables(c):
+    c.execute(
+        """
+        CREATE TABLE seat_classes (
+            code TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            price_multiplier REAL NOT NULL DEFAULT 1.0
+        )
+    """
+    )
+    c.executemany("INSERT INTO seat_classes VALUES (?, ?, ?)", DEFAULT_CLASSES)
+    c.execute(
+        """
+        CREATE TABLE screens (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            rows INTEGER NOT NULL,
+            cols INTEGER NOT NULL,
+            layout TEXT NOT NULL
+        )
+    """
+    )
+    c.execute(
+        "INSERT INTO screens (id, name, rows, cols, layout) VALUES (?, ?, ?, ?, ?)",
+        (DEFAULT_SCREEN_ID, "Screen 1", 5, 10, "\n".join(grid_rows(5, 10))),
+    )
+    c.execute(
+        """
+        CREATE TABLE show_screens (
+            movie_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            screen_id INTEGER NOT NULL REFERENCES screens(id),
+            PRIMARY KEY (movie_id, date, time)
+        )
+    """
+    )
+
+
+# Returns an error message for a malformed layout, or None
+def validate_rows(rows, classes):
+    if not rows or not all(isinstance(r, str) and r for r in rows):
+        return "Layout must be a non-empty list of row strings"
+    allowed = set(classes) | {AISLE, BLOCKED}
+    bad = {ch for r in rows for ch in r} - allowed
+    if bad:
+        return f"Unknown layout cells: {''.join(sorted(bad))}"
+    if not any(ch not in (AISLE, BLOCKED) for r in rows for ch in r):
+        return "Layout has no sellable seats"
+    return None
+
+
+def create_screen(c, name, rows):
+    c.execute(
+        "INSERT INTO screens (name, rows, cols, layout) VALUES (?, ?, ?, ?)",
+        (name, len(rows), max(len(r) for r in rows), "\n".join(rows)),
+    )
+    return c.lastrowid
+
+
+# Parsed layouts by screen id. Screens are never edited in place, so
+# entries stay valid until the process exits.
+class LayoutStore:
+    def __init__(self):
+        self._layouts = {}
+        self._multipliers = None
+        self._lock = threading.Lock()
+
+    def multipliers(self, c):
+        if self._multipliers is None:
+            c.execute("SELECT code, price_multiplier FROM seat_classes")
+            self._multipliers = dict(c.fetchall())
+        return self._multipliers
+
+    def get(self, c, screen_id):
+        layout = self._layouts.get(screen_id)
+        if layout is None:
+            c.execute("SELECT name, layout FROM screens WHERE id=?", (screen_id,))
+            row = c.fetchone()
+            if not row:
+                return None
+            layout = Layout(screen_id, row[0], row[1].split("\n"), self.multipliers(c))
+            with self._lock:
+                self._layouts[screen_id] = layout
+        return layout
+
+    # Sellable seats per screen id, for every screen
+    def capacities(self, c):
+        c.execute("SELECT id FROM screens")
+        return {sid: self.get(c, sid).sellable for (sid,) in c.fetchall()}
+
+    def clear(self):
+        with self._lock:
+            self._layouts.clear()
+            self._multipliers = None
@@ -0,0 +1,370 @@
+"""Request instrumentation: per-route latency, SQL query counts and timings,
+slow-query plans and an opt-in sampling profiler, exported as Prometheus
+text on /metrics.
+
+Everything here is in-process and lock-protected counters, so it stays on
+in production. SQL statements are timed by the connection factory the
+pool uses (``TracedConnection``); a statement's time is measured up to its
+first result row.
+
+When several worker processes serve the app, each keeps its own counters
+and stores a ``snapshot()`` of them in the database (see shared.py);
+/metrics renders the sum of every worker's snapshot, so a scrape that
+lands on any worker sees the whole server and counters never go
+backwards.
+"""
+
+import bisect
+import collections
+import contextvars
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from flask import current_app, g, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SLOW_QUERY_SECONDS = float(os.environ.get("CINEBOOK_SLOW_QUERY_MS", "100")) / 1000
+PROFILE_HEADER = "X-Profile"
+PROFILE_INTERVAL_SECONDS = 0.001
+PROFILE_HISTORY = 20
+
+log = logging.getLogger("cinebook.sql")
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+    @staticmethod
+    def combine(total, value):
+        return value if total is None else total + value
+
+    # merged: label values -> value from several snapshots; default: ours
+    def render(self, merged=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        if merged is None:
+            with self._lock:
+                merged = dict(self._values)
+        for label_values, value in sorted(merged.items()):
+            lines.append(f"{self.name}{_labels(self.labels, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.labels = labels
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[slot] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(k), list(v)] for k, v in self._series.items()]
+
+    @staticmethod
+    def combine(total, value):
+        return list(value) if total is None else [a + b for a, b in zip(total, value)]
+
+    def render(self, merged=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        if merged is None:
+            with self._lock:
+                merged = {k: list(v) for k, v in self._series.items()}
+        for label_values, series in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                le = _labels(self.labels + ("le",), label_values + (_number(bound),))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")  # noqa: E731
+    return "{" + ",".join(f'{n}="{escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+REQUESTS = Counter(
+    "cinebook_http_requests_total", "HTTP requests by route and status.",
+    ("method", "route", "status"),
+)
+REQUEST_LATENCY = Histogram(
+    "cinebook_http_request_duration_seconds", "Time to produce a response.",
+    LATENCY_BUCKETS, ("method", "route"),
+)
+REQUEST_QUERIES = Histogram(
+    "cinebook_http_request_db_queries", "SQL statements run per request.",
+    QUERY_COUNT_BUCKETS, ("method", "route"),
+)
+REQUEST_DB_TIME = Histogram(
+    "cinebook_http_request_db_seconds", "Time spent in SQL per request.",
+    LATENCY_BUCKETS, ("method", "route"),
+)
+POOL_WAIT = Histogram(
+    "cinebook_db_pool_wait_seconds", "Time waiting for a pooled connection.",
+    QUERY_BUCKETS,
+)
+QUERY_LATENCY = Histogram(
+    "cinebook_db_query_duration_seconds", "SQL statement time to first row.",
+    QUERY_BUCKETS, ("statement",),
+)
+SLOW_QUERIES = Counter(
+    "cinebook_db_slow_queries_total", "SQL statements slower than the slow-query threshold.",
+)
+REGISTRY = [REQUESTS, REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_DB_TIME, POOL_WAIT,
+            QUERY_LATENCY, SLOW_QUERIES]
+
+
+# This process's metrics as JSON-friendly data
+def snapshot():
+    return {metric.name: metric.snapshot() for metric in REGISTRY}
+
+
+# Sum of several snapshots, itself a snapshot
+def merge(snapshots):
+    result = {}
+    for metric in REGISTRY:
+        merged = {}
+        for data in snapshots:
+            for label_values, value in data.get(metric.name, []):
+                key = tuple(label_values)
+                merged[key] = metric.combine(merged.get(key), value)
+        result[metric.name] = [[list(k), v] for k, v in merged.items()]
+    return result
+
+
+# Prometheus text for a snapshot, or for this process's live metrics
+def render(data=None):
+    lines = []
+    for metric in REGISTRY:
+        if data is None:
+            lines.extend(metric.render())
+        else:
+            lines.extend(metric.render({tuple(k): v for k, v in data.get(metric.name, [])}))
+    return "\n".join(lines) + "\n"
+
+
+_process = (None, None)
+
+
+# Identifies this process's row of stored metrics; a forked child gets its own
+def process_id():
+    global _process
+    pid = os.getpid()
+    if _process[0] != pid:
+        _process = (pid, f"{pid}-{uuid.uuid4().hex[:8]}")
+    return _process[1]
+
+
+# ------------------ SQL tracing ------------------
+
+
+# Query count and SQL time of the request running in this context
+class _QueryStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_current = contextvars.ContextVar("cinebook_query_stats", default=None)
+# First keyword of each SQL string seen; the app only runs a few hundred
+_verbs = {}
+
+
+def _verb(sql):
+    verb = _verbs.get(sql)
+    if verb is None:
+        words = sql.split(None, 1)
+        verb = words[0].upper() if words else ""
+        if len(_verbs) < 4096:
+            _verbs[sql] = verb
+    return verb
+
+
+def _record(conn, sql, params, elapsed, many=False):
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+    verb = _verb(sql)
+    QUERY_LATENCY.observe(elapsed, verb)
+    if elapsed >= SLOW_QUERY_SECONDS and verb in ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT"):
+        SLOW_QUERIES.inc()
+        plan = ""
+        if not many:
+            try:
+                rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+                plan = "\n".join(f"  {row[-1]}" for row in rows)
+            except sqlite3.Error:
+                pass
+        log.warning("slow query (%.1f ms): %s\n%s", elapsed * 1000, " ".join(sql.split()), plan)
+
+
+class TracedCursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            _record(self.connection, sql, params, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_params):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            _record(self.connection, sql, (), time.perf_counter() - start, many=True)
+
+
+# Connection factory for the pool; conn.execute() goes through cursor()
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+
+# ------------------ Sampling profiler ------------------
+
+
+# Samples one thread's stack at a fixed interval while a request runs and
+# keeps the result as collapsed stacks ("a;b;c 12"), the input format of
+# flamegraph tools
+class SamplingProfiler(threading.Thread):
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_SECONDS):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while True:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+            if self._stop_event.wait(self.interval):
+                break
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
+
+
+_profiles = collections.OrderedDict()
+_profiles_lock = threading.Lock()
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        return _profiles.get(profile_id)
+
+
+# ------------------ Flask Integration ------------------
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.query_stats = _QueryStats()
+    g.query_stats_token = _current.set(g.query_stats)
+    if current_app.config["PROFILING"] and request.headers.get(PROFILE_HEADER):
+        g.profiler = SamplingProfiler(threading.get_ident())
+        g.profiler.start()
+
+
+def _after_request(response):
+    elapsed = time.perf_counter() - g.metrics_start
+    stats = g.query_stats
+    route, method = _route(), request.method
+    REQUESTS.inc(method, route, str(response.status_code))
+    REQUEST_LATENCY.observe(elapsed, method, route)
+    REQUEST_QUERIES.observe(stats.queries, method, route)
+    REQUEST_DB_TIME.observe(stats.seconds, method, route)
+    wait = g.get("db_wait")
+    if wait is not None:
+        POOL_WAIT.observe(wait)
+
+    timings = [f'db;dur={stats.seconds * 1000:.2f};desc="{stats.queries} queries"']
+    if wait is not None:
+        timings.append(f"pool;dur={wait * 1000:.2f}")
+    timings.append(f"total;dur={elapsed * 1000:.2f}")
+    response.headers["Server-Timing"] = ", ".join(timings)
+
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profile_id = uuid.uuid4().hex[:12]
+        with _profiles_lock:
+            _profiles[profile_id] = profiler.stop()
+            while len(_profiles) > PROFILE_HISTORY:
+                _profiles.popitem(last=False)
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+def _teardown_request(exc=None):
+    token = g.pop("query_stats_token", None)
+    if token is not None:
+        _current.reset(token)
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.stop()
+
+
+# Profiling is off unless CINEBOOK_PROFILING=1 (or PROFILING=True in config)
+def init_app(app):
+    app.config.setdefault("PROFILING", os.environ.get("CINEBOOK_PROFILING") == "1")
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,322 @@
+"""Versioned schema migrations, tracked with SQLite's ``user_version``.
+
+Run against existing databases to upgrade them in place:
+
+    python migrations.py movies.db cinebook.db movie_booking.db
+"""
+
+import sqlite3
+import sys
+import threading
+
+import analytics
+import layouts
+import schedule
+import shared
+from catalog import parse_duration
+from db import show_key, transaction
+
+
+def _columns(c, table):
+    c.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in c.fetchall()}
+
+
+# 1: the schema app.py has always created, plus upgrades for older copies
+# of the database that predate the date/time/status booking columns
+def _base_schema(c):
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS movies (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            genre TEXT,
+            duration TEXT,
+            price INTEGER
+        )
+    """
+    )
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            movie_id INTEGER,
+            movie_title TEXT,
+            date TEXT,
+            time TEXT,
+            seats TEXT,
+            name TEXT,
+            email TEXT,
+            phone TEXT,
+            total INTEGER,
+            status TEXT
+        )
+    """
+    )
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password TEXT,
+            role TEXT CHECK(role IN ('admin','user'))
+        )
+    """
+    )
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS seat_holds (
+            id TEXT PRIMARY KEY,
+            movie_id INTEGER,
+            date TEXT,
+            time TEXT,
+            seats TEXT,
+            expires_at REAL
+        )
+    """
+    )
+
+    # Older databases keyed users by user_id; login looks up users.id
+    if "user_id" in _columns(c, "users"):
+        c.execute("ALTER TABLE users RENAME COLUMN user_id TO id")
+
+    columns = _columns(c, "bookings")
+    for column in ("movie_title", "date", "time", "status"):
+        if column not in columns:
+            c.execute(f"ALTER TABLE bookings ADD COLUMN {column} TEXT")
+    if "movie" in columns:
+        c.execute("UPDATE bookings SET movie_title=movie WHERE movie_title IS NULL")
+    c.execute(
+        """
+        UPDATE bookings SET movie_title=(
+            SELECT title FROM movies WHERE movies.id=bookings.movie_id
+        ) WHERE movie_title IS NULL
+    """
+    )
+    c.execute("UPDATE bookings SET status='Confirmed' WHERE status IS NULL")
+
+
+# 2: one row per sold seat, so a seat can only be sold once per show
+def _booking_seats(c):
+    c.execute(
+        """
+        CREATE TABLE booking_seats (
+            booking_id INTEGER NOT NULL REFERENCES bookings(id),
+            show_key TEXT NOT NULL,
+            seat_no INTEGER NOT NULL,
+            UNIQUE(show_key, seat_no)
+        )
+    """
+    )
+    c.execute("CREATE INDEX idx_booking_seats_booking ON booking_seats(booking_id)")
+
+    # Split the comma-joined seats of every active booking. Seats that were
+    # sold twice before this table existed keep their earliest booking.
+    c.execute(
+        """
+        WITH RECURSIVE split(booking_id, show_key, seat, rest) AS (
+            SELECT id, show_key(movie_id, date, time), '', seats || ','
+            FROM bookings
+            WHERE status != 'Cancelled' AND seats IS NOT NULL AND seats != ''
+            UNION ALL
+            SELECT booking_id, show_key,
+                   TRIM(SUBSTR(rest, 1, INSTR(rest, ',') - 1)),
+                   SUBSTR(rest, INSTR(rest, ',') + 1)
+            FROM split WHERE rest != ''
+        )
+        INSERT OR IGNORE INTO booking_seats (booking_id, show_key, seat_no)
+        SELECT booking_id, show_key, CAST(seat AS INTEGER)
+        FROM split WHERE seat != ''
+        ORDER BY booking_id
+    """
+    )
+
+
+# 3: indexes for show, customer and status lookups
+def _booking_indexes(c):
+    c.execute(
+        """
+        CREATE INDEX idx_bookings_show
+        ON bookings(movie_id, date, time, status, seats)
+    """
+    )
+    c.execute("CREATE INDEX idx_bookings_email ON bookings(email COLLATE NOCASE)")
+    c.execute("CREATE INDEX idx_bookings_phone ON bookings(phone)")
+    c.execute("CREATE INDEX idx_bookings_status ON bookings(status)")
+    c.execute(
+        "CREATE INDEX idx_seat_holds_show ON seat_holds(movie_id, date, time, expires_at)"
+    )
+    c.execute("CREATE INDEX idx_seat_holds_expiry ON seat_holds(expires_at)")
+
+
+# 4: owner of each booking, for per-user listings
+def _booking_user(c):
+    c.execute("ALTER TABLE bookings ADD COLUMN user_id INTEGER")
+    c.execute("CREATE INDEX idx_bookings_user ON bookings(user_id)")
+    c.execute("CREATE INDEX idx_bookings_movie ON bookings(movie_id, date)")
+
+
+# 5: sales aggregates (filled by the rebuild in migration 8, once shows
+# know their capacity)
+def _sales_aggregates(c):
+    analytics.create_tables(c)
+
+
+# 6: durations as whole minutes, so they sort numerically
+def _duration_minutes(c):
+    c.execute("ALTER TABLE movies ADD COLUMN duration_minutes INTEGER")
+    c.execute("UPDATE movies SET duration_minutes=parse_duration(duration)")
+
+
+# 7: screens with seat layouts and classes, and which screen a show uses
+def _screens(c):
+    layouts.create_tables(c)
+
+
+# 8: a row per show, created for every show that already has bookings or
+# holds, with its screen, capacity and seats sold so far
+def _shows(c):
+    schedule.create_tables(c)
+
+    c.execute("SELECT id, name, layout FROM screens")
+    capacities = {
+        sid: layouts.Layout(sid, name, rows.split("\n"), {}).sellable
+        for sid, name, rows in c.fetchall()
+    }
+    c.execute("SELECT movie_id, date, time, screen_id FROM show_screens")
+    screens = {tuple(row[:3]): row[3] for row in c.fetchall()}
+    c.execute("SELECT show_key, COUNT(*) FROM booking_seats GROUP BY show_key")
+    sold = dict(c.fetchall())
+    c.execute(
+        """
+        SELECT movie_id, date, time FROM bookings
+        WHERE movie_id IS NOT NULL AND date IS NOT NULL AND time IS NOT NULL
+        UNION SELECT movie_id, date, time FROM seat_holds
+        UNION SELECT movie_id, date, time FROM show_screens
+    """
+    )
+    rows = []
+    for key in c.fetchall():
+        screen_id = screens.get(key, layouts.DEFAULT_SCREEN_ID)
+        rows.append(
+            key[:1]
+            + (screen_id,)
+            + key[1:]
+            + (
+                schedule.parse_start(key[1], key[2]),
+                capacities[screen_id],
+                sold.get(show_key(*key), 0),
+            )
+        )
+    c.executemany(
+        """
+        INSERT INTO shows (movie_id, screen_id, date, time, starts_at, capacity, seats_sold)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+        rows,
+    )
+    c.execute("DROP TABLE show_screens")
+
+    analytics.add_capacity(c)
+    analytics.rebuild(c)
+
+
+# 9: server-side sessions and the cross-worker message log
+def _shared_state(c):
+    shared.create_tables(c)
+
+
+# 10: per-worker metrics, summed by /metrics
+def _worker_metrics(c):
+    shared.create_metrics_table(c)
+
+
+MIGRATIONS = [
+    (1, "base schema", _base_schema),
+    (2, "normalized booking seats", _booking_seats),
+    (3, "booking indexes", _booking_indexes),
+    (4, "booking owner", _booking_user),
+    (5, "sales aggregates", _sales_aggregates),
+    (6, "movie duration minutes", _duration_minutes),
+    (7, "screens and seat layouts", _screens),
+    (8, "shows", _shows),
+    (9, "shared sessions and messages", _shared_state),
+    (10, "worker metrics", _worker_metrics),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+# Apply every migration newer than the database's user_version, each in
+# its own transaction; returns the versions that were applied. The version
+# is checked again under the write lock, so processes starting together
+# apply each migration once.
+def migrate(conn):
+    conn.create_function("show_key", 3, show_key, deterministic=True)
+    conn.create_function("parse_duration", 1, parse_duration, deterministic=True)
+    applied = []
+    for version, _description, apply in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        with transaction(conn) as c:
+            if version <= schema_version(conn):
+                continue
+            apply(c)
+            c.execute(f"PRAGMA user_version={version}")
+        applied.append(version)
+    return applied
+
+
+class SchemaMismatch(RuntimeError):
+    pass
+
+
+# Databases this process has already seen at LATEST_VERSION
+_current = set()
+_current_lock = threading.Lock()
+
+
+# Make sure a pool's database is at LATEST_VERSION, checking at most once
+# per process. Up-to-date databases cost one PRAGMA read; read_only callers
+# never run DDL and fail if the schema is behind. Returns the versions
+# applied.
+def ensure_schema(pool, read_only=False):
+    if pool.path in _current:
+        return []
+    with pool.connection() as conn:
+        version = schema_version(conn)
+        if version > LATEST_VERSION:
+            raise SchemaMismatch(
+                f"{pool.path} is at schema v{version}, newer than this code (v{LATEST_VERSION})"
+            )
+        applied = []
+        if version < LATEST_VERSION:
+            if read_only:
+                raise SchemaMismatch(
+                    f"{pool.path} is at schema v{version}, expected v{LATEST_VERSION};"
+                    " run `flask db init` (without CINEBOOK_READ_ONLY) first"
+                )
+            applied = migrate(conn)
+    with _current_lock:
+        _current.add(pool.path)
+    return applied
+
+
+def main(paths):
+    for path in paths:
+        conn = sqlite3.connect(path, isolation_level=None)
+        before = schema_version(conn)
+        applied = migrate(conn)
+        conn.close()
+        if applied:
+            print(f"{path}: v{before} -> v{applied[-1]}")
+        else:
+            print(f"{path}: already at v{before}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ["movies.db"])
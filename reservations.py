@@ -0,0 +1,291 @@
+import sqlite3
+import threading
+import time as _time
+import uuid
+
+import analytics
+import schedule
+from db import show_key, transaction
+
+HOLD_TTL_SECONDS = 300
+SWEEP_INTERVAL_SECONDS = 30
+
+
+class SeatConflict(Exception):
+    def __init__(self, seats):
+        super().__init__(f"Seats already taken: {', '.join(map(str, seats))}")
+        self.seats = seats
+
+
+class HoldNotFound(Exception):
+    pass
+
+
+# Raised by book_batch with a {"index", "conflicts"} entry per failed item
+class BatchConflict(Exception):
+    def __init__(self, failures):
+        super().__init__(f"Seats already taken for {len(failures)} of the bookings")
+        self.failures = failures
+
+
+def parse_seats(seats_str):
+    return [int(s) for s in (seats_str or "").split(",") if s.strip()]
+
+
+# Seats that are booked or held (and not yet expired) for one show
+def _taken_seats(c, key, now):
+    c.execute("SELECT seat_no FROM booking_seats WHERE show_key=?", (show_key(*key),))
+    taken = {row[0] for row in c.fetchall()}
+    c.execute(
+        "SELECT seats FROM seat_holds WHERE movie_id=? AND date=? AND time=? AND expires_at > ?",
+        key + (now,),
+    )
+    for (seats,) in c.fetchall():
+        taken.update(parse_seats(seats))
+    return taken
+
+
+# Whether any unexpired hold exists for one show
+def has_live_holds(c, key, now=None):
+    now = _time.time() if now is None else now
+    c.execute(
+        "SELECT 1 FROM seat_holds WHERE movie_id=? AND date=? AND time=? AND expires_at > ? LIMIT 1",
+        tuple(key) + (now,),
+    )
+    return c.fetchone() is not None
+
+
+def _check_free(c, key, seats, now):
+    conflicts = sorted(set(seats) & _taken_seats(c, key, now))
+    if conflicts:
+        raise SeatConflict(conflicts)
+
+
+def _insert_booking(c, key, seats, booking):
+    c.execute(
+        """
+        INSERT INTO bookings (movie_id, movie_title, date, time, seats, name, email, phone, total, status, user_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """,
+        (
+            key[0],
+            booking["movie_title"],
+            key[1],
+            key[2],
+            ",".join(map(str, seats)),
+            booking.get("name"),
+            booking.get("email"),
+            booking.get("phone"),
+            booking["total"],
+            "Confirmed",
+            booking.get("user_id"),
+        ),
+    )
+    booking_id = c.lastrowid
+    # The unique (show_key, seat_no) constraint is the last line of defence
+    # against selling a seat twice
+    try:
+        c.executemany(
+            "INSERT INTO booking_seats (booking_id, show_key, seat_no) VALUES (?, ?, ?)",
+            [(booking_id, show_key(*key), seat) for seat in seats],
+        )
+    except sqlite3.IntegrityError:
+        raise SeatConflict(seats)
+    schedule.record_sale(c, key, len(seats))
+    analytics.record_booking(c, key, booking["movie_title"], len(seats), booking["total"])
+    return booking_id
+
+
+# Every write below runs in a BEGIN IMMEDIATE transaction, which takes the
+# write lock before the availability check so that the check and the insert
+# cannot interleave with another writer. on_change(c, op, key, seats), if
+# given, is called inside that transaction for each seat change it makes,
+# so anything it writes commits (and is ordered) with the change itself.
+
+
+# Take a short-lived hold on seats, failing if any are booked or held
+def create_hold(conn, key, seats, ttl=HOLD_TTL_SECONDS, on_change=None):
+    hold_id = uuid.uuid4().hex
+    now = _time.time()
+    expires_at = now + ttl
+
+    with transaction(conn) as c:
+        _check_free(c, key, seats, now)
+        c.execute(
+            "INSERT INTO seat_holds (id, movie_id, date, time, seats, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (hold_id, key[0], key[1], key[2], ",".join(map(str, seats)), expires_at),
+        )
+        if on_change:
+            on_change(c, "hold", key, seats)
+    return {"hold_id": hold_id, "seats": seats, "expires_at": expires_at}
+
+
+def get_hold(conn, hold_id):
+    c = conn.cursor()
+    c.execute(
+        "SELECT movie_id, date, time, seats, expires_at FROM seat_holds WHERE id=?",
+        (hold_id,),
+    )
+    row = c.fetchone()
+    if not row or row[4] <= _time.time():
+        raise HoldNotFound(hold_id)
+    return {
+        "hold_id": hold_id,
+        "key": (row[0], row[1], row[2]),
+        "seats": parse_seats(row[3]),
+        "expires_at": row[4],
+    }
+
+
+# Turn a live hold into a confirmed booking
+def confirm_hold(conn, hold_id, booking, on_change=None):
+    with transaction(conn) as c:
+        c.execute(
+            "SELECT movie_id, date, time, seats FROM seat_holds WHERE id=? AND expires_at > ?",
+            (hold_id, _time.time()),
+        )
+        row = c.fetchone()
+        if not row:
+            raise HoldNotFound(hold_id)
+        c.execute("DELETE FROM seat_holds WHERE id=?", (hold_id,))
+        key, seats = tuple(row[:3]), parse_seats(row[3])
+        booking_id = _insert_booking(c, key, seats, booking)
+        if on_change:
+            on_change(c, "confirm", key, seats)
+        return booking_id, seats
+
+
+def release_hold(conn, hold_id, on_change=None):
+    with transaction(conn) as c:
+        c.execute(
+            "SELECT movie_id, date, time, seats FROM seat_holds WHERE id=?",
+            (hold_id,),
+        )
+        row = c.fetchone()
+        if not row:
+            raise HoldNotFound(hold_id)
+        c.execute("DELETE FROM seat_holds WHERE id=?", (hold_id,))
+        key, seats = tuple(row[:3]), parse_seats(row[3])
+        if on_change:
+            on_change(c, "unhold", key, seats)
+        return key, seats
+
+
+# Check and insert in one transaction; used when no hold was taken first
+def book_seats(conn, key, seats, booking, on_change=None):
+    with transaction(conn) as c:
+        _check_free(c, key, seats, _time.time())
+        booking_id = _insert_booking(c, key, seats, booking)
+        if on_change:
+            on_change(c, "book", key, seats)
+        return booking_id
+
+
+# Book many (key, seats, booking) items in one transaction: every item is
+# checked against the seats already taken before anything is written, and
+# if any conflicts nothing is. Returns the new booking ids in item order.
+def book_batch(conn, items, on_change=None):
+    now = _time.time()
+    with transaction(conn) as c:
+        taken, failures = {}, []
+        for i, (key, seats, _) in enumerate(items):
+            if key not in taken:
+                taken[key] = _taken_seats(c, key, now)
+            conflicts = sorted(set(seats) & taken[key])
+            if conflicts:
+                failures.append({"index": i, "conflicts": conflicts})
+            taken[key].update(seats)
+        if failures:
+            raise BatchConflict(failures)
+
+        # Explicit ids let the bookings go in with one executemany; nobody
+        # else can insert while this transaction holds the write lock
+        c.execute(
+            "SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name='bookings'), 0),"
+            " COALESCE((SELECT MAX(id) FROM bookings), 0))"
+        )
+        first_id = c.fetchone()[0] + 1
+        booking_ids = list(range(first_id, first_id + len(items)))
+        c.executemany(
+            """
+            INSERT INTO bookings (id, movie_id, movie_title, date, time, seats, name, email, phone, total, status, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+            [
+                (booking_id, key[0], b["movie_title"], key[1], key[2], ",".join(map(str, seats)),
+                 b.get("name"), b.get("email"), b.get("phone"), b["total"], "Confirmed", b.get("user_id"))
+                for booking_id, (key, seats, b) in zip(booking_ids, items)
+            ],
+        )
+        try:
+            c.executemany(
+                "INSERT INTO booking_seats (booking_id, show_key, seat_no) VALUES (?, ?, ?)",
+                [
+                    (booking_id, show_key(*key), seat)
+                    for booking_id, (key, seats, _) in zip(booking_ids, items)
+                    for seat in seats
+                ],
+            )
+        except sqlite3.IntegrityError:
+            raise BatchConflict([{"index": i, "conflicts": s} for i, (_, s, _) in enumerate(items)])
+
+        # Sales and analytics move once per show rather than once per booking
+        per_show = {}
+        for key, seats, booking in items:
+            totals = per_show.setdefault(key, [booking["movie_title"], 0, 0, 0])
+            totals[1] += 1
+            totals[2] += len(seats)
+            totals[3] += booking["total"]
+        schedule.record_sales(c, {key: totals[2] for key, totals in per_show.items()})
+        for key, (title, bookings, seats, total) in per_show.items():
+            analytics.record_bookings(c, key, title, bookings, seats, total)
+        if on_change:
+            booked = {}
+            for key, seats, _ in items:
+                booked.setdefault(key, []).extend(seats)
+            for key, seats in booked.items():
+                on_change(c, "book", key, seats)
+    return booking_ids
+
+
+# Delete expired holds and return what they were holding
+def expire_holds(conn, now=None, on_change=None):
+    now = _time.time() if now is None else now
+
+    with transaction(conn) as c:
+        c.execute(
+            "SELECT movie_id, date, time, seats FROM seat_holds WHERE expires_at <= ?",
+            (now,),
+        )
+        expired = [(tuple(row[:3]), parse_seats(row[3])) for row in c.fetchall()]
+        c.execute("DELETE FROM seat_holds WHERE expires_at <= ?", (now,))
+        if on_change:
+            for key, seats in expired:
+                on_change(c, "unhold", key, seats)
+        return expired
+
+
+# Background thread that periodically reclaims expired holds; on_expired is
+# the on_change hook of expire_holds
+class HoldSweeper(threading.Thread):
+    def __init__(self, pool, on_expired, interval=SWEEP_INTERVAL_SECONDS):
+        super().__init__(name="hold-sweeper", daemon=True)
+        self.pool = pool
+        self.on_expired = on_expired
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def sweep(self):
+        with self.pool.connection() as conn:
+            return expire_holds(conn, on_change=self.on_expired)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception:
+                # Database busy or gone; try again on the next tick
+                pass
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,209 @@
+"""Shows: which movie plays on which screen, when, and how full it is.
+
+A show is still identified by ``(movie_id, date, time)`` everywhere else in
+the app; ``shows.id`` is its public id. ``seats_sold`` is updated in the
+same transaction as every booking and cancellation, so "seats left" and
+"sold out" are read from a single row.
+"""
+
+from datetime import date as _date, datetime, timedelta
+
+DEFAULT_SHOWTIMES = ("10:00 AM", "01:00 PM", "04:00 PM", "07:00 PM", "10:00 PM")
+TIME_FORMATS = ("%I:%M %p", "%H:%M")
+MAX_GENERATE_DAYS = 62
+
+SHOW_COLUMNS = (
+    "id",
+    "movie_id",
+    "screen_id",
+    "date",
+    "time",
+    "starts_at",
+    "capacity",
+    "seats_sold",
+)
+SHOW_SELECT = f"SELECT {', '.join(SHOW_COLUMNS)} FROM shows"
+
+
+def create_tables(c):
+    c.execute(
+        """
+        CREATE TABLE shows (
+            id INTEGER PRIMARY KEY,
+            movie_id INTEGER NOT NULL,
+            screen_id INTEGER NOT NULL REFERENCES screens(id),
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            starts_at TEXT,
+            capacity INTEGER NOT NULL,
+            seats_sold INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (movie_id, date, time)
+        )
+    """
+    )
+    c.execute("CREATE INDEX idx_shows_date ON shows(date, movie_id)")
+    c.execute("CREATE INDEX idx_shows_screen ON shows(screen_id, starts_at)")
+
+
+# "2025-10-12", "01:00 PM" -> "2025-10-12 13:00"; None if either is malformed
+def parse_start(date, time):
+    try:
+        day = _date.fromisoformat(date)
+    except (TypeError, ValueError):
+        return None
+    for fmt in TIME_FORMATS:
+        try:
+            clock = datetime.strptime((time or "").strip(), fmt).time()
+        except ValueError:
+            continue
+        return datetime.combine(day, clock).strftime("%Y-%m-%d %H:%M")
+    return None
+
+
+def now_text():
+    return datetime.now().strftime("%Y-%m-%d %H:%M")
+
+
+def show_from_row(row):
+    show = dict(zip(SHOW_COLUMNS, row))
+    show["seats_left"] = max(show["capacity"] - show["seats_sold"], 0)
+    show["sold_out"] = show["seats_left"] == 0
+    return show
+
+
+def has_started(show, now=None):
+    return show["starts_at"] is not None and show["starts_at"] <= (now or now_text())
+
+
+def get_show(c, show_id):
+    c.execute(f"{SHOW_SELECT} WHERE id=?", (show_id,))
+    row = c.fetchone()
+    return show_from_row(row) if row else None
+
+
+def find_show(c, key):
+    c.execute(f"{SHOW_SELECT} WHERE movie_id=? AND date=? AND time=?", key)
+    row = c.fetchone()
+    return show_from_row(row) if row else None
+
+
+def screen_for_show(c, key):
+    c.execute("SELECT screen_id FROM shows WHERE movie_id=? AND date=? AND time=?", key)
+    row = c.fetchone()
+    return row[0] if row else None
+
+
+# Keep seats_sold in step with bookings; negative counts undo a sale
+def record_sale(c, key, seats):
+    c.execute(
+        "UPDATE shows SET seats_sold = seats_sold + ? WHERE movie_id=? AND date=? AND time=?",
+        (seats,) + tuple(key),
+    )
+
+
+# record_sale for several shows: {key: seats}
+def record_sales(c, sales):
+    c.executemany(
+        "UPDATE shows SET seats_sold = seats_sold + ? WHERE movie_id=? AND date=? AND time=?",
+        [(seats,) + tuple(key) for key, seats in sales.items()],
+    )
+
+
+# Shows matching the listing filters, in start order
+def list_shows(c, movie_id=None, screen_id=None, date=None, date_from=None,
+               date_to=None, upcoming=False, available=False):
+    clauses, params = [], []
+    for column, value in (("movie_id", movie_id), ("screen_id", screen_id), ("date", date)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if date_from:
+        clauses.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("date <= ?")
+        params.append(date_to)
+    if upcoming:
+        clauses.append("starts_at > ?")
+        params.append(now_text())
+    if available:
+        clauses.append("seats_sold < capacity")
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    c.execute(f"{SHOW_SELECT} {where} ORDER BY starts_at, movie_id, id", params)
+    return [show_from_row(row) for row in c.fetchall()]
+
+
+# Today and the following days, as YYYY-MM-DD
+def upcoming_dates(days):
+    today = _date.today()
+    return [(today + timedelta(days=i)).isoformat() for i in range(days)]
+
+
+def date_range(date_from, date_to):
+    start = _date.fromisoformat(date_from)
+    end = _date.fromisoformat(date_to)
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+# Validate schedule rows ({movie_id, screen_id, date, time}) against the
+# known movies and screen capacities. Returns the insert rows and a list of
+# {"index", "error"} failures; nothing is written.
+def validate_schedule(items, movie_ids, capacities, now=None):
+    now = now or now_text()
+    rows, errors, seen = [], [], set()
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": i, "error": "Show must be an object"})
+            continue
+        try:
+            movie_id = int(item.get("movie_id"))
+            screen_id = int(item.get("screen_id"))
+        except (TypeError, ValueError):
+            errors.append({"index": i, "error": "movie_id and screen_id must be integers"})
+            continue
+        date, time = item.get("date"), item.get("time")
+        starts_at = parse_start(date, time)
+        if movie_id not in movie_ids:
+            error = "Movie not found"
+        elif screen_id not in capacities:
+            error = "Screen not found"
+        elif starts_at is None:
+            error = "Date must be YYYY-MM-DD and time like '07:00 PM'"
+        elif starts_at <= now:
+            error = "Show would start in the past"
+        else:
+            error = None
+        if error:
+            errors.append({"index": i, "error": error})
+            continue
+        # Store times in the one format the booking pages send back
+        time = datetime.strptime(starts_at, "%Y-%m-%d %H:%M").strftime("%I:%M %p")
+        if (movie_id, date, time) in seen:
+            errors.append({"index": i, "error": "Duplicate show"})
+            continue
+        seen.add((movie_id, date, time))
+        rows.append((movie_id, screen_id, date, time, starts_at, capacities[screen_id]))
+    return rows, errors
+
+
+# Insert validated rows; shows that already exist are left untouched.
+# Returns the number of shows created.
+def insert_shows(c, rows):
+    c.executemany(
+        """
+        INSERT OR IGNORE INTO shows (movie_id, screen_id, date, time, starts_at, capacity)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+        rows,
+    )
+    return c.rowcount
+
+
+# One show per movie, date and showtime on a single screen
+def generate_schedule(movie_ids, screen_id, dates, times=DEFAULT_SHOWTIMES):
+    return [
+        {"movie_id": movie_id, "screen_id": screen_id, "date": date, "time": time}
+        for date in dates
+        for movie_id in movie_ids
+        for time in times
+    ]
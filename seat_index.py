@@ -0,0 +1,109 @@
+import threading
+import time as _time
+
+
+def iter_bits(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+# Per-show seat occupancy kept as integer bitsets (bit n set = seat n taken)
+class SeatIndex:
+    def __init__(self):
+        self._shows = {}
+        self._held = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    @staticmethod
+    def show_key(movie_id, date, time):
+        return (int(movie_id), date, time)
+
+    @staticmethod
+    def _mask(seats):
+        mask = 0
+        for seat in seats:
+            mask |= 1 << int(seat)
+        return mask
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    # Build the whole index once from the bookings table
+    def load(self, conn):
+        with self._lock:
+            if self._loaded:
+                return
+            c = conn.cursor()
+            c.execute(
+                """
+                SELECT movie_id, date, time, seats FROM bookings
+                WHERE status IS NULL OR status != 'Cancelled'
+            """
+            )
+            for movie_id, date, time, seats in c.fetchall():
+                if movie_id is None or not seats:
+                    continue
+                key = self.show_key(movie_id, date, time)
+                seat_list = [s for s in seats.split(",") if s.strip()]
+                self._shows[key] = self._shows.get(key, 0) | self._mask(seat_list)
+            c.execute(
+                "SELECT movie_id, date, time, seats FROM seat_holds WHERE expires_at > ?",
+                (_time.time(),),
+            )
+            for movie_id, date, time, seats in c.fetchall():
+                key = self.show_key(movie_id, date, time)
+                seat_list = [s for s in seats.split(",") if s.strip()]
+                self._held[key] = self._held.get(key, 0) | self._mask(seat_list)
+            self._loaded = True
+
+    def book(self, key, seats):
+        with self._lock:
+            self._shows[key] = self._shows.get(key, 0) | self._mask(seats)
+
+    def release(self, key, seats):
+        with self._lock:
+            self._clear(self._shows, key, seats)
+
+    def hold(self, key, seats):
+        with self._lock:
+            self._held[key] = self._held.get(key, 0) | self._mask(seats)
+
+    def unhold(self, key, seats):
+        with self._lock:
+            self._clear(self._held, key, seats)
+
+    # Move seats from held to booked in one step
+    def confirm(self, key, seats):
+        with self._lock:
+            self._clear(self._held, key, seats)
+            self._shows[key] = self._shows.get(key, 0) | self._mask(seats)
+
+    def _clear(self, shows, key, seats):
+        remaining = shows.get(key, 0) & ~self._mask(seats)
+        if remaining:
+            shows[key] = remaining
+        else:
+            shows.pop(key, None)
+
+    def bitmap(self, key):
+        return self._shows.get(key, 0)
+
+    def booked(self, key):
+        return list(iter_bits(self.bitmap(key)))
+
+    def held(self, key):
+        return list(iter_bits(self._held.get(key, 0)))
+
+    # Seats that are either booked or held
+    def occupied(self, key):
+        return self.bitmap(key) | self._held.get(key, 0)
+
+    def reset(self):
+        with self._lock:
+            self._shows.clear()
+            self._held.clear()
+            self._loaded = False
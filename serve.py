@@ -0,0 +1,114 @@
+"""Production server: several worker processes, each running a threaded WSGI
+server on one shared listening socket.
+
+    python serve.py --workers 4 --port 8000
+
+The schema is migrated once in the parent before forking; workers are
+read-only for DDL and only check its version. Each worker then builds its
+own app (connection pool, caches, background threads) and picks
+up connections from the shared socket, so the kernel spreads them across
+processes. Workers stay consistent through the database (see shared.py).
+A worker that exits is logged and replaced; SIGTERM or SIGINT stops them all.
+Any other WSGI server works the same way, e.g.
+``gunicorn -w 4 --threads 16 "app:create_app()"``.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+
+from werkzeug.serving import make_server
+
+import db
+
+MIN_WORKER_LIFETIME_SECONDS = 5
+RESTART_DELAY_SECONDS = 1
+
+
+def run_worker(host, port, fd, pool_size):
+    from app import create_app
+
+    app = create_app({"READ_ONLY": True, "DB_POOL_SIZE": pool_size})
+    server = make_server(host, port, app, threaded=True, fd=fd)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        app.extensions["cinebook"].stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--backlog", type=int, default=1024)
+    parser.add_argument("--pool-size", type=int, default=db.POOL_SIZE,
+                        help="database connections per worker")
+    args = parser.parse_args()
+
+    from app import DB_FILE, bootstrap_db
+
+    pool = db.ConnectionPool(DB_FILE, 1)
+    bootstrap_db(pool)
+    pool.close()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(args.backlog)
+    sock.set_inheritable(True)
+
+    # pid -> when the worker started
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                run_worker(args.host, args.port, sock.fileno(), args.pool_size)
+            finally:
+                os._exit(0)
+        children[pid] = time.monotonic()
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(args.workers):
+        spawn()
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers", flush=True)
+
+    # Replace workers that exit until we are told to stop
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting",
+              file=sys.stderr, flush=True)
+        # Do not spin when workers die as soon as they start
+        if time.monotonic() - started < MIN_WORKER_LIFETIME_SECONDS:
+            time.sleep(RESTART_DELAY_SECONDS)
+        if not stopping:
+            spawn()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
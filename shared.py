@@ -0,0 +1,277 @@
+"""State shared between worker processes through the SQLite database.
+
+When the app runs as several processes, each keeps its own caches (catalog,
+screen layouts, seat index). Two tables in the main database let them stay
+consistent:
+
+* ``sessions`` holds server-side sessions, so a login made in one worker is
+  seen by all of them; the cookie carries only a random session id.
+* ``messages`` is an append-only log of changes. A worker that changes
+  cached state appends a message in the same transaction as the change, so
+  the log is in commit order; every worker, the writer included, reads the
+  messages it has not seen before handling a request, after its own writes
+  and from a background thread, and applies them to its own caches in that
+  order. A worker that fell behind the pruned tail of the log drops its
+  caches instead.
+* ``worker_metrics`` holds each worker's request and SQL metrics, written
+  every few seconds and when /metrics is scraped, which renders their sum.
+  Rows of workers that stopped reporting are folded into one "retired"
+  row, so the totals never go down.
+"""
+
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import uuid
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+import metrics
+from db import get_db, transaction
+
+POLL_INTERVAL_SECONDS = 0.25
+PRUNE_INTERVAL_SECONDS = 60
+MESSAGE_TTL_SECONDS = 600
+METRICS_FLUSH_SECONDS = 5
+METRICS_TTL_SECONDS = 3600
+RETIRED_WORKERS = "retired"
+
+log = logging.getLogger("cinebook.shared")
+
+
+def create_tables(c):
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """
+    )
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            origin TEXT NOT NULL,
+            topic TEXT NOT NULL,
+            data TEXT,
+            created_at REAL NOT NULL
+        )
+    """
+    )
+
+
+def create_metrics_table(c):
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS worker_metrics (
+            worker TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """
+    )
+
+
+# ------------------ Sessions ------------------
+
+
+# Keys that say who the session belongs to; changing any of them (login,
+# switching accounts) moves the session to a new id
+IDENTITY_KEYS = ("user", "id", "role")
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.identity = self.current_identity()
+        self.modified = False
+
+    def current_identity(self):
+        return tuple(self.get(k) for k in IDENTITY_KEYS)
+
+
+# Flask session interface backed by the sessions table. Sessions are only
+# written when they change, so ordinary requests cost one primary-key read.
+# Both go through the request's own pooled connection: taking a second one
+# while the request holds the first deadlocks once the pool runs dry.
+class SessionStore(SessionInterface):
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            row = get_db().execute(
+                "SELECT data FROM sessions WHERE id=? AND expires_at > ?",
+                (sid, time.time()),
+            ).fetchone()
+            if row:
+                return ServerSession(json.loads(row[0]), sid)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.sid:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified and session.sid:
+                get_db().execute("DELETE FROM sessions WHERE id=?", (session.sid,))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if not (session.modified or self.should_set_cookie(app, session)):
+            return
+
+        # A new id whenever a session is first stored or its identity
+        # changes, so an id planted before login is worthless after it
+        if session.sid and session.current_identity() != session.identity:
+            get_db().execute("DELETE FROM sessions WHERE id=?", (session.sid,))
+            session.sid = None
+        session.sid = session.sid or secrets.token_urlsafe(32)
+        session.identity = session.current_identity()
+        expires_at = time.time() + app.permanent_session_lifetime.total_seconds()
+        get_db().execute(
+            """
+            INSERT INTO sessions (id, data, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET data=excluded.data, expires_at=excluded.expires_at
+        """,
+            (session.sid, json.dumps(dict(session)), expires_at),
+        )
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+# ------------------ Worker metrics ------------------
+
+
+def save_metrics(conn):
+    conn.execute(
+        """
+        INSERT INTO worker_metrics (worker, data, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT (worker) DO UPDATE SET data=excluded.data, updated_at=excluded.updated_at
+    """,
+        (metrics.process_id(), json.dumps(metrics.snapshot()), time.time()),
+    )
+
+
+# Sum of every worker's stored metrics, as a metrics snapshot
+def load_metrics(conn):
+    rows = conn.execute("SELECT data FROM worker_metrics").fetchall()
+    return metrics.merge([json.loads(row[0]) for row in rows])
+
+
+def retire_metrics(conn, now):
+    with transaction(conn) as c:
+        c.execute(
+            "SELECT worker, data FROM worker_metrics WHERE updated_at < ? AND worker != ?",
+            (now - METRICS_TTL_SECONDS, RETIRED_WORKERS),
+        )
+        stale = c.fetchall()
+        if not stale:
+            return
+        c.execute("SELECT data FROM worker_metrics WHERE worker=?", (RETIRED_WORKERS,))
+        snapshots = [json.loads(row[0]) for row in c.fetchall()]
+        snapshots += [json.loads(data) for _, data in stale]
+        c.executemany("DELETE FROM worker_metrics WHERE worker=?", [(w,) for w, _ in stale])
+        c.execute(
+            """
+            INSERT INTO worker_metrics (worker, data, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT (worker) DO UPDATE SET data=excluded.data, updated_at=excluded.updated_at
+        """,
+            (RETIRED_WORKERS, json.dumps(metrics.merge(snapshots)), now),
+        )
+
+
+# ------------------ Cross-worker messages ------------------
+
+
+# Appends to and follows the messages table for one process. handler(topic,
+# data) is called for every message, in log order; reset() when messages
+# were missed. origin records which process wrote a message.
+class MessageBus(threading.Thread):
+    def __init__(self, pool, handler, reset, interval=POLL_INTERVAL_SECONDS):
+        super().__init__(name="message-bus", daemon=True)
+        self.pool = pool
+        self.handler = handler
+        self.reset = reset
+        self.interval = interval
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.cursor = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._pruned_at = time.monotonic()
+        self._metrics_saved_at = time.monotonic()
+
+    # Call inside the transaction making the change, so messages are ordered
+    # as their changes committed
+    def publish(self, conn, topic, data=None):
+        conn.execute(
+            "INSERT INTO messages (origin, topic, data, created_at) VALUES (?, ?, ?, ?)",
+            (self.origin, topic, json.dumps(data), time.time()),
+        )
+
+    # Apply messages written since the last sync. Ids are assigned under
+    # SQLite's write lock, so they become visible in order and without gaps
+    # except where old messages were pruned.
+    def sync(self, conn):
+        with self._lock:
+            if self.cursor is None:
+                # Caches start empty and load from the database, so only
+                # later messages matter
+                self.cursor = conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+                return 0
+            rows = conn.execute(
+                "SELECT id, origin, topic, data FROM messages WHERE id > ? ORDER BY id",
+                (self.cursor,),
+            ).fetchall()
+            if not rows:
+                return 0
+            if rows[0][0] != self.cursor + 1:
+                log.warning("missed messages %d-%d; dropping caches", self.cursor + 1, rows[0][0] - 1)
+                self.reset()
+            for message_id, _origin, topic, data in rows:
+                self.handler(topic, json.loads(data))
+                self.cursor = message_id
+            return len(rows)
+
+    def prune(self, conn, now=None):
+        now = time.time() if now is None else now
+        conn.execute("DELETE FROM messages WHERE created_at < ?", (now - MESSAGE_TTL_SECONDS,))
+        conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+        retire_metrics(conn, now)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                with self.pool.connection() as conn:
+                    self.sync(conn)
+                    if time.monotonic() - self._metrics_saved_at > METRICS_FLUSH_SECONDS:
+                        self._metrics_saved_at = time.monotonic()
+                        save_metrics(conn)
+                    if time.monotonic() - self._pruned_at > PRUNE_INTERVAL_SECONDS:
+                        self._pruned_at = time.monotonic()
+                        self.prune(conn)
+            except Exception:
+                # Database busy or gone; try again on the next tick
+                log.exception("message sync failed")
+
+    def stop(self):
+        self._stop_event.set()
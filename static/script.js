@@ -1,9 +1,10 @@
 // ------------------ Global Variables ------------------
 let movies = [];
-const showtimes = ["10:00 AM", "01:00 PM", "04:00 PM", "07:00 PM", "10:00 PM"];
-const totalSeats = 50;
 let selectedSeats = [];
 let bookedSeats = {};
+let showScreens = {};
+let currentHold = null;
+let seatEvents = null;
 
 // ------------------ Initialize ------------------
 document.addEventListener("DOMContentLoaded", () => {
@@ -100,12 +101,21 @@ function updateShowtimes() {
 
   select.innerHTML = '<option value="">Choose a showtime</option>';
   if (movieId && date) {
-    showtimes.forEach((time) => {
-      const opt = document.createElement("option");
-      opt.value = time;
-      opt.textContent = time;
-      select.appendChild(opt);
-    });
+    fetch(`/api/shows?movie_id=${movieId}&date=${date}&upcoming=1`)
+      .then((res) => res.json())
+      .then((shows) => {
+        if (shows.length === 0)
+          select.innerHTML = '<option value="">No shows on this date</option>';
+        shows.forEach((show) => {
+          const opt = document.createElement("option");
+          opt.value = show.time;
+          opt.textContent = show.sold_out
+            ? `${show.time} (sold out)`
+            : `${show.time} (${show.seats_left} seats left)`;
+          opt.disabled = show.sold_out;
+          select.appendChild(opt);
+        });
+      });
   }
 
   document.getElementById("seatsContainer").style.display = "none";
@@ -120,41 +130,117 @@ function loadSeats(autoAssign = false) {
   if (!movieId || !date || !time) return;
 
   const key = `${movieId}-${date}-${time}`;
+  const seatsUrl = `/api/shows/${movieId}/${encodeURIComponent(
+    date
+  )}/${encodeURIComponent(time)}/seats`;
+  releaseHold();
 
-  fetch(`/api/bookings?search=`)
+  fetch(seatsUrl)
     .then((res) => res.json())
     .then((data) => {
-      bookedSeats[key] = [];
-      data.bookings.forEach((b) => {
-        if (b.movie_id == movieId && b.date == date && b.time == time) {
-          bookedSeats[key] = bookedSeats[key].concat(b.seats.map(Number));
-        }
-      });
-
+      bookedSeats[key] = data.booked.concat(data.held);
+      showScreens[key] = data.screen;
       renderSeats(key, autoAssign);
+      watchSeats(data.show_id, key, seatsUrl, data.last_event_id);
+    });
+}
+
+// ------------------ Live Seat Updates ------------------
+// Apply other buyers' holds, bookings and releases as they happen instead
+// of re-fetching the whole seat map. lastEventId comes with the seat map
+// snapshot, so changes made since it was taken are replayed.
+function watchSeats(showId, key, seatsUrl, lastEventId) {
+  stopWatchingSeats();
+  const since = lastEventId
+    ? `?last_event_id=${encodeURIComponent(lastEventId)}`
+    : "";
+  seatEvents = new EventSource(`/api/shows/${showId}/events${since}`);
+  const apply = (taken) => (e) => {
+    JSON.parse(e.data).seats.forEach((s) => setSeatTaken(key, s, taken));
+    updateSummary();
+  };
+  seatEvents.addEventListener("held", apply(true));
+  seatEvents.addEventListener("booked", apply(true));
+  seatEvents.addEventListener("released", apply(false));
+  // Missed events while disconnected (or reconnected to another server
+  // process); catch up from a fresh snapshot, keeping the hold and selection
+  seatEvents.addEventListener("reset", () => refreshTakenSeats(key, seatsUrl));
+}
+
+function refreshTakenSeats(key, seatsUrl) {
+  fetch(seatsUrl)
+    .then((res) => res.json())
+    .then((data) => {
+      const taken = new Set(data.booked.concat(data.held));
+      const known = new Set(bookedSeats[key] || []);
+      taken.forEach((s) => known.has(s) || setSeatTaken(key, s, true));
+      known.forEach((s) => taken.has(s) || setSeatTaken(key, s, false));
+      updateSummary();
     });
 }
 
+function stopWatchingSeats() {
+  if (seatEvents) seatEvents.close();
+  seatEvents = null;
+}
+
+function setSeatTaken(key, seatNum, taken) {
+  if (taken && currentHold && currentHold.seats.includes(seatNum)) return;
+  const booked = bookedSeats[key] || (bookedSeats[key] = []);
+  const idx = booked.indexOf(seatNum);
+  if (taken && idx === -1) booked.push(seatNum);
+  if (!taken && idx > -1) booked.splice(idx, 1);
+
+  const seatEl = document.querySelector(`[data-seat="${seatNum}"]`);
+  if (!seatEl || seatEl.classList.contains("blocked")) return;
+  if (taken) {
+    const selected = selectedSeats.indexOf(seatNum);
+    if (selected > -1) selectedSeats.splice(selected, 1);
+    seatEl.classList.remove("selected");
+    seatEl.classList.add("booked");
+    seatEl.onclick = null;
+  } else {
+    seatEl.classList.remove("booked");
+    seatEl.onclick = () => toggleSeat(seatNum, key);
+  }
+}
+
 function renderSeats(key, autoAssign = false) {
   const grid = document.getElementById("seatsGrid");
   grid.innerHTML = "";
-  const booked = bookedSeats[key] || [];
+  const booked = new Set(bookedSeats[key] || []);
+  const screen = showScreens[key];
   selectedSeats = [];
+  grid.style.gridTemplateColumns = `repeat(${screen.cols}, 1fr)`;
+
+  // One cell per layout position; null cells are aisles
+  screen.grid.forEach((row) => {
+    for (let col = 0; col < screen.cols; col++) {
+      const cell = row[col];
+      const seat = document.createElement("div");
+      if (!cell) {
+        seat.className = "seat-gap";
+        grid.appendChild(seat);
+        continue;
+      }
+      const i = cell.seat;
+      seat.className = "seat";
+      seat.textContent = cell.label;
+      seat.title = `Seat ${i}`;
+      seat.dataset.seat = i;
+
+      if (cell.class === "X") {
+        seat.classList.add("blocked");
+      } else if (booked.has(i)) {
+        seat.classList.add("booked");
+      } else {
+        if (cell.multiplier > 1) seat.classList.add("premium");
+        seat.onclick = () => toggleSeat(i, key);
+      }
 
-  for (let i = 1; i <= totalSeats; i++) {
-    const seat = document.createElement("div");
-    seat.className = "seat";
-    seat.textContent = i;
-    seat.dataset.seat = i;
-
-    if (booked.includes(i)) {
-      seat.classList.add("booked");
-    } else {
-      seat.onclick = () => toggleSeat(i, key);
+      grid.appendChild(seat);
     }
-
-    grid.appendChild(seat);
-  }
+  });
 
   if (autoAssign) autoAssignSeats();
   document.getElementById("seatsContainer").style.display = "block";
@@ -178,20 +264,30 @@ function toggleSeat(seatNum, key) {
 
 // ------------------ Auto Assign Seats ------------------
 function autoAssignSeats() {
-  fetch(`/api/book`, {
+  releaseHold();
+  fetch(`/api/hold`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({
       movie_id: document.getElementById("movieSelect").value,
       date: document.getElementById("dateSelect").value,
       time: document.getElementById("showtimeSelect").value,
-      seats: [],
+      count: 1,
     }),
   })
     .then((res) => res.json())
     .then((data) => {
+      if (!data.hold_id) return showMessage(data.message, "error");
+      currentHold = data;
       selectedSeats = data.seats;
+      const key = [
+        document.getElementById("movieSelect").value,
+        document.getElementById("dateSelect").value,
+        document.getElementById("showtimeSelect").value,
+      ].join("-");
       selectedSeats.forEach((s) => {
+        // Our own "held" event may have arrived before this response
+        setSeatTaken(key, s, false);
         const seatEl = document.querySelector(`[data-seat="${s}"]`);
         if (seatEl) seatEl.classList.add("selected");
       });
@@ -199,7 +295,31 @@ function autoAssignSeats() {
     });
 }
 
+// Give back held seats that the buyer did not keep
+function releaseHold() {
+  if (!currentHold) return;
+  fetch(`/api/hold/${currentHold.hold_id}`, { method: "DELETE" });
+  currentHold = null;
+}
+
+function holdMatchesSelection() {
+  if (!currentHold) return false;
+  const held = [...currentHold.seats].sort((a, b) => a - b).join(",");
+  return held === [...selectedSeats].sort((a, b) => a - b).join(",");
+}
+
 // ------------------ Booking Summary ------------------
+// Ticket price times each seat's class multiplier, as the server charges it
+function seatsTotal(movie, key) {
+  const multipliers = {};
+  (showScreens[key]?.grid || []).flat().forEach((cell) => {
+    if (cell) multipliers[cell.seat] = cell.multiplier;
+  });
+  return Math.round(
+    selectedSeats.reduce((sum, s) => sum + movie.price * (multipliers[s] || 1), 0)
+  );
+}
+
 function updateSummary() {
   const movieId = document.getElementById("movieSelect").value;
   const date = document.getElementById("dateSelect").value;
@@ -207,7 +327,7 @@ function updateSummary() {
 
   if (selectedSeats.length > 0 && movieId) {
     const movie = movies.find((m) => m.id == movieId);
-    const total = selectedSeats.length * movie.price;
+    const total = seatsTotal(movie, `${movieId}-${date}-${time}`);
 
     document.getElementById("summaryMovie").textContent = movie.title;
     document.getElementById(
@@ -237,23 +357,42 @@ function confirmBooking() {
     return showMessage("Please select at least one seat", "error");
 
   const movie = movies.find((m) => m.id == movieId);
-  const total = selectedSeats.length * movie.price;
-
-  fetch("/api/book", {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({
-      movie_id: movieId,
-      movie_title: movie.title,
-      date,
-      time,
-      seats: selectedSeats,
-      user_id: currentUser.id,
-      total,
-    }),
-  })
-    .then((res) => res.json())
-    .then((data) => {
+  const total = seatsTotal(movie, `${movieId}-${date}-${time}`);
+  // Our own "booked" event would otherwise deselect the seats being bought
+  stopWatchingSeats();
+
+  let request;
+  if (holdMatchesSelection()) {
+    request = fetch(`/api/hold/${currentHold.hold_id}/confirm`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ user_id: currentUser.id }),
+    });
+  } else {
+    releaseHold();
+    request = fetch("/api/book", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        movie_id: movieId,
+        movie_title: movie.title,
+        date,
+        time,
+        seats: selectedSeats,
+        user_id: currentUser.id,
+        total,
+      }),
+    });
+  }
+  currentHold = null;
+
+  request
+    .then((res) => res.json().then((data) => ({ ok: res.ok, data })))
+    .then(({ ok, data }) => {
+      if (!ok) {
+        showMessage(data.message, "error");
+        return loadSeats();
+      }
       showMessage(data.message, "success");
       setTimeout(resetBookingForm, 2000);
     });
@@ -280,23 +419,36 @@ function resetBookingForm() {
   document.getElementById("seatsContainer").style.display = "none";
   document.getElementById("bookingSummary").style.display = "none";
   selectedSeats = [];
+  stopWatchingSeats();
 }
 
 // ------------------ Load User Bookings ------------------
+// Follow next_after_id cursors until every page has been fetched
+function fetchAllBookings(query, afterId = null, acc = []) {
+  const cursor = afterId ? `&after_id=${afterId}` : "";
+  return fetch(`/api/bookings?${query}&limit=500${cursor}`)
+    .then((res) => res.json())
+    .then((data) => {
+      acc = acc.concat(data.bookings || []);
+      return data.next_after_id
+        ? fetchAllBookings(query, data.next_after_id, acc)
+        : acc;
+    });
+}
+
 function loadUserBookings() {
   const filter = document.getElementById("filterStatus")?.value || "all";
 
-  fetch(`/api/bookings?userId=${currentUser.id}`)
-    .then((res) => res.json())
-    .then((data) => {
-      let bookings = data.bookings || [];
+  fetchAllBookings(`userId=${currentUser.id}`)
+    .then((all) => {
+      let bookings = all;
       const list = document.getElementById("bookingsList");
       list.innerHTML = "";
 
       if (bookings.length === 0)
         return (list.innerHTML = "<p>No bookings yet.</p>");
 
-      bookings.sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+      bookings.sort((a, b) => b.id - a.id);
 
       if (filter === "active")
         bookings = bookings.filter((b) => b.status !== "Cancelled");
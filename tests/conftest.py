@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+
+
+def make_app(database=":memory:"):
+    return create_app({"TESTING": True, "DATABASE": database})
+
+
+@pytest.fixture
+def app():
+    app = make_app()
+    yield app
+    app.extensions["db_pool"].close()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(app):
+    client = app.test_client()
+    response = client.post("/login", json={"username": "admin", "password": "admin123"})
+    assert response.json == {"redirect": "/admin"}
+    return client
+
+
+# The first seeded show that has not started yet
+@pytest.fixture
+def show(client):
+    return client.get("/api/shows?upcoming=1").json[0]
+
+
+def seats_url(show):
+    return f"/api/shows/{show['movie_id']}/{show['date']}/{show['time']}/seats"
+
+
+def show_body(show, **fields):
+    return {"movie_id": show["movie_id"], "date": show["date"], "time": show["time"], **fields}
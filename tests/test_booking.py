@@ -0,0 +1,119 @@
+import pytest
+
+from conftest import seats_url, show_body
+
+
+def test_book_conflict_cancel(client, show):
+    response = client.post("/api/book", json=show_body(show, seats=[5, 6]))
+    assert response.status_code == 200
+    booking_id = response.json["booking_id"]
+    seats = client.get(seats_url(show)).json
+    assert seats["booked"] == [5, 6]
+    assert seats["available"] == seats["total_seats"] - 2
+
+    response = client.post("/api/book", json=show_body(show, seats=[6, 7]))
+    assert response.status_code == 409
+    assert response.json["conflicts"] == [6]
+    assert client.get(seats_url(show)).json["booked"] == [5, 6]
+
+    assert client.delete(f"/api/cancel_booking/{booking_id}").status_code == 200
+    seats = client.get(seats_url(show)).json
+    assert seats["booked"] == []
+    assert seats["available"] == seats["total_seats"]
+    assert client.post("/api/book", json=show_body(show, seats=[6, 7])).status_code == 200
+
+
+def test_book_picks_seats_when_none_given(client, show):
+    response = client.post("/api/book", json=show_body(show))
+    assert response.status_code == 200
+    assert client.get(seats_url(show)).json["booked"] == response.json["seats"]
+
+
+def test_hold_then_confirm(client, show):
+    hold = client.post("/api/hold", json=show_body(show, seats=[10, 11])).json
+    assert client.get(seats_url(show)).json["held"] == [10, 11]
+    assert client.post("/api/book", json=show_body(show, seats=[11])).status_code == 409
+
+    response = client.post(f"/api/hold/{hold['hold_id']}/confirm", json={"name": "Ann"})
+    assert response.status_code == 200
+    assert response.json["seats"] == [10, 11]
+    seats = client.get(seats_url(show)).json
+    assert seats["booked"] == [10, 11]
+    assert seats["held"] == []
+    assert client.post(f"/api/hold/{hold['hold_id']}/confirm", json={}).status_code == 410
+
+
+def test_hold_then_release(client, show):
+    hold = client.post("/api/hold", json=show_body(show, count=3)).json
+    assert len(hold["seats"]) == 3
+    assert client.get(seats_url(show)).json["held"] == sorted(hold["seats"])
+
+    assert client.delete(f"/api/hold/{hold['hold_id']}").status_code == 200
+    seats = client.get(seats_url(show)).json
+    assert seats["held"] == []
+    assert seats["available"] == seats["total_seats"]
+    assert client.delete(f"/api/hold/{hold['hold_id']}").status_code == 404
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"movie_id": None},
+        {"movie_id": "x"},
+        {"seats": [True]},
+        {"seats": [2.0]},
+        {"seats": ["3"]},
+        {"seats": 5},
+        {"seats": "5"},
+        {"seats": [0]},
+        {"seats": [10_000]},
+    ],
+)
+@pytest.mark.parametrize("url", ["/api/book", "/api/hold"])
+def test_bad_seat_requests(client, show, url, fields):
+    response = client.post(url, json={**show_body(show), **fields})
+    assert response.status_code == 400
+    assert client.get(seats_url(show)).json["booked"] == []
+
+
+@pytest.mark.parametrize("count", [True, "2", 2.7, 0])
+def test_bad_hold_count(client, show, count):
+    assert client.post("/api/hold", json=show_body(show, count=count)).status_code == 400
+
+
+def test_batch(client, show):
+    response = client.post(
+        "/api/book/batch",
+        json=[show_body(show, seats=[30, 31]), show_body(show, count=2)],
+    )
+    assert response.status_code == 200
+    booked = [s for b in response.json["bookings"] for s in b["seats"]]
+    assert client.get(seats_url(show)).json["booked"] == sorted(booked)
+
+
+@pytest.mark.parametrize(
+    "item",
+    [
+        "not an object",
+        {"movie_id": "x"},
+        {"seats": [True]},
+        {"seats": ["3"]},
+        {"seats": 5},
+        {"count": 2.5},
+        {"count": "2"},
+        {"seats": [10_000]},
+    ],
+)
+def test_bad_batch_items(client, show, item):
+    if isinstance(item, dict):
+        item = {**show_body(show), **item}
+    response = client.post("/api/book/batch", json=[show_body(show, seats=[1]), item])
+    assert response.status_code == 400
+    assert [f["index"] for f in response.json["failures"]] == [1]
+    assert client.get(seats_url(show)).json["booked"] == []
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"{}", b"[]"])
+def test_bad_batch_body(client, body):
+    response = client.post("/api/book/batch", data=body, content_type="application/json")
+    assert response.status_code == 400
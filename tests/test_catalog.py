@@ -0,0 +1,56 @@
+import pytest
+
+MOVIE = {"title": "Arrival", "genre": "Sci-Fi", "duration": "1h 56m", "price": 12}
+
+
+def test_add_movie(admin, client):
+    response = admin.post("/api/admin/add_movie", json=MOVIE)
+    assert response.status_code == 200
+    movie = next(m for m in client.get("/api/movies").json if m["title"] == "Arrival")
+    assert movie["price"] == 12
+    assert movie["duration_minutes"] == 116
+
+
+def test_add_movie_needs_admin(client):
+    assert client.post("/api/admin/add_movie", json=MOVIE).status_code == 403
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"title": ""},
+        {"price": None},
+        {"price": "ten"},
+        {"price": "12.5"},
+        {"price": True},
+        {"price": -1},
+        {"duration": "a while"},
+    ],
+)
+def test_add_movie_rejects_bad_fields(admin, client, fields):
+    before = client.get("/api/movies").json
+    response = admin.post("/api/admin/add_movie", json={**MOVIE, **fields})
+    assert response.status_code == 400
+    assert client.get("/api/movies").json == before
+
+
+@pytest.mark.parametrize("price", ["120", 150, 0, 9.0])
+def test_add_movie_accepts_whole_prices(admin, price):
+    assert admin.post("/api/admin/add_movie", json={**MOVIE, "price": price}).status_code == 200
+
+
+def test_movies_etag(admin, client):
+    response = client.get("/api/movies?sort_by=price")
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+
+    response = client.get("/api/movies?sort_by=price", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    # Another listing has its own tag
+    assert client.get("/api/movies?sort_by=title").headers["ETag"] != etag
+
+    admin.post("/api/admin/add_movie", json=MOVIE)
+    response = client.get("/api/movies?sort_by=price", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,72 @@
+"""Two apps on one database file stand in for two worker processes."""
+
+import pytest
+
+from conftest import make_app, seats_url, show_body
+
+MOVIE = {"title": "Arrival", "genre": "Sci-Fi", "duration": "116 min", "price": 12}
+
+
+@pytest.fixture
+def apps(tmp_path):
+    database = str(tmp_path / "movies.db")
+    apps = [make_app(database), make_app(database)]
+    yield apps
+    for app in apps:
+        app.extensions["db_pool"].close()
+
+
+def test_bookings_and_cancellations_sync(apps):
+    a, b = (app.test_client() for app in apps)
+    show = a.get("/api/shows?upcoming=1").json[0]
+
+    booking_id = a.post("/api/book", json=show_body(show, seats=[3, 4])).json["booking_id"]
+    assert b.get(seats_url(show)).json["booked"] == [3, 4]
+    assert b.post("/api/book", json=show_body(show, seats=[4])).status_code == 409
+
+    assert b.delete(f"/api/cancel_booking/{booking_id}").status_code == 200
+    assert a.get(seats_url(show)).json["booked"] == []
+
+
+def test_holds_sync(apps):
+    a, b = (app.test_client() for app in apps)
+    show = a.get("/api/shows?upcoming=1").json[0]
+
+    hold = a.post("/api/hold", json=show_body(show, seats=[8])).json
+    assert b.get(seats_url(show)).json["held"] == [8]
+    assert b.post(f"/api/hold/{hold['hold_id']}/confirm", json={}).status_code == 200
+    seats = a.get(seats_url(show)).json
+    assert (seats["booked"], seats["held"]) == ([8], [])
+
+
+def test_auto_assign_skips_seats_taken_elsewhere(apps):
+    a, b = (app.test_client() for app in apps)
+    show = a.get("/api/shows?upcoming=1").json[0]
+
+    # b has seen the empty show before a books, so its index starts stale
+    assert b.get(seats_url(show)).json["booked"] == []
+    first = a.post("/api/book", json=show_body(show)).json["seats"]
+    second = b.post("/api/book", json=show_body(show)).json["seats"]
+    assert set(first).isdisjoint(second)
+
+
+def test_catalog_and_sessions_sync(apps):
+    a, b = (app.test_client() for app in apps)
+    assert a.post("/login", json={"username": "admin", "password": "admin123"}).status_code == 200
+    before = b.get("/api/movies")
+
+    # The session cookie from a is valid on b
+    response = b.post("/api/admin/add_movie", json=MOVIE)
+    assert response.status_code == 403
+    b.set_cookie(*_session_cookie(a))
+    response = b.post("/api/admin/add_movie", json=MOVIE)
+    assert response.status_code == 200
+
+    response = a.get("/api/movies", headers={"If-None-Match": before.headers["ETag"]})
+    assert response.status_code == 200
+    assert "Arrival" in [m["title"] for m in response.json]
+
+
+def _session_cookie(client):
+    cookie = client.get_cookie("session")
+    return cookie.key, cookie.value